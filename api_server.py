@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+
+# Headless HTTP service exposing document processing, the agents and chat.
+# Run with LLM_BACKEND=fake EMBEDDING_BACKEND=fake to serve the local fakes.
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Requests handled at once; up to API_MAX_QUEUE more wait, the rest get 503
+API_MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", "8"))
+API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "32"))
+# Threads running CPU-bound parsing and embedding (parsing fans out to its own process pool)
+API_CPU_WORKERS = int(os.getenv("API_CPU_WORKERS", "2"))
+API_MAX_CORPORA = int(os.getenv("API_MAX_CORPORA", "32"))
+API_MAX_UPLOAD_MB = int(os.getenv("API_MAX_UPLOAD_MB", "200"))
+MAX_CHAT_SESSIONS = 256
+
+AGENTS = ("summary", "gaps", "ideas", "debate", "citation", "visual_insights")
+
+def _error(status, message, headers=None):
+    return web.json_response({"error": message}, status=status, headers=headers)
+
+def _http_error(error_class, message):
+    return error_class(text=json.dumps({"error": message}), content_type="application/json")
+
+def _corpus_id(file_hashes):
+    """Corpus IDs are derived from the file contents, so re-uploading a set reuses it"""
+    return hashlib.sha256("\0".join(sorted(file_hashes)).encode("utf-8")).hexdigest()[:16]
+
+class AgentServer:
+    """
+    asyncio HTTP API over the document pipeline and the agents
+
+    Model instances are shared by every request. Processed document sets
+    (chunks, FAISS store, BM25 index, parsed pages) are kept by corpus ID
+    with LRU eviction. Parsing and embedding run in a bounded thread pool
+    and LLM calls in worker threads, so the event loop stays responsive;
+    beyond API_MAX_INFLIGHT running and API_MAX_QUEUE waiting requests, new
+    requests are rejected with 503 and Retry-After.
+    """
+
+    def __init__(self, llm=None, embedding=None, max_inflight=API_MAX_INFLIGHT, max_queue=API_MAX_QUEUE,
+                 cpu_workers=API_CPU_WORKERS, max_corpora=API_MAX_CORPORA):
+        from resources import get_llm, get_embedding
+
+        self.llm = llm if llm is not None else get_llm()
+        self.chat_llm = llm
+        self.report_llm = llm
+        self.embedding = embedding if embedding is not None else get_embedding()
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.max_corpora = max_corpora
+        self.cpu_pool = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="api-cpu")
+        self.corpora = OrderedDict()
+        self.sessions = OrderedDict()
+        self._building = {}
+        self._semaphore = None
+        self._waiting = 0
+        self._inflight = 0
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0}
+
+    def _get_chat_llm(self):
+        if self.chat_llm is None:
+            from resources import get_llm
+            from llm_scheduler import INTERACTIVE
+            # Chat questions are scheduled ahead of agent and report calls
+            self.chat_llm = get_llm(priority=INTERACTIVE)
+        return self.chat_llm
+
+    def _get_report_llm(self):
+        if self.report_llm is None:
+            from resources import get_llm
+            from llm_scheduler import BATCH
+            # Reports yield to interactive agent and chat calls
+            self.report_llm = get_llm(priority=BATCH)
+        return self.report_llm
+
+    @web.middleware
+    async def _backpressure(self, request, handler):
+        if request.path == "/health":
+            return await handler(request)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            return _error(503, "server overloaded, retry later", headers={"Retry-After": "1"})
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self.stats["requests"] += 1
+        self._inflight += 1
+        try:
+            return await handler(request)
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            return _error(500, f"{type(e).__name__}: {e}")
+        finally:
+            self._inflight -= 1
+            self._semaphore.release()
+
+    def _corpus(self, request):
+        corpus = self.corpora.get(request.match_info["corpus_id"])
+        if corpus is None:
+            raise _http_error(web.HTTPNotFound, "unknown corpus")
+        self.corpora.move_to_end(corpus["id"])
+        return corpus
+
+    async def _json(self, request, *fields):
+        try:
+            body = await request.json()
+        except Exception:
+            raise _http_error(web.HTTPBadRequest, "expected a JSON body")
+        missing = [field for field in fields if not body.get(field)]
+        if missing:
+            raise _http_error(web.HTTPBadRequest, f"missing fields: {', '.join(missing)}")
+        return body
+
+    def _build_corpus(self, files):
+        from document_processor import update_corpus
+
+        documents, vectorstore, indexed_files, lexical_index, _ = update_corpus(files, self.embedding)
+        return {
+            "documents": documents,
+            "vectorstore": vectorstore,
+            "indexed_files": indexed_files,
+            "lexical_index": lexical_index,
+        }
+
+    def _summary(self, corpus):
+        return {
+            "corpus_id": corpus["id"],
+            "files": [entry["name"] for entry in corpus["indexed_files"].values()],
+            "chunks": len(corpus["documents"]),
+            "pages": sum(len(entry["parsed"]["pages"]) for entry in corpus["indexed_files"].values()),
+            "seconds": corpus["seconds"],
+        }
+
+    async def health(self, request):
+        return web.json_response({
+            "status": "ok",
+            "inflight": self._inflight,
+            "waiting": self._waiting,
+            "corpora": len(self.corpora),
+            "chat_sessions": len(self.sessions),
+            **self.stats,
+        })
+
+    async def create_corpus(self, request):
+        """POST /corpora: multipart upload of one or more PDFs; parses, chunks and embeds them"""
+        from document_processor import file_fingerprint
+
+        files = []
+        reader = await request.multipart()
+        async for part in reader:
+            if part.filename:
+                upload = io.BytesIO(await part.read(decode=False))
+                upload.name = part.filename
+                files.append(upload)
+        if not files:
+            return _error(400, "upload at least one PDF file")
+
+        loop = asyncio.get_running_loop()
+        file_hashes = await loop.run_in_executor(self.cpu_pool, lambda: [file_fingerprint(f) for f in files])
+        corpus_id = _corpus_id(file_hashes)
+        if corpus_id in self.corpora:
+            self.corpora.move_to_end(corpus_id)
+            return web.json_response(self._summary(self.corpora[corpus_id]))
+
+        # Concurrent uploads of the same files share one build
+        build = self._building.get(corpus_id)
+        if build is None:
+            build = asyncio.ensure_future(self._store_corpus(corpus_id, files))
+            self._building[corpus_id] = build
+            build.add_done_callback(lambda _: self._building.pop(corpus_id, None))
+        corpus = await asyncio.shield(build)
+        if corpus["vectorstore"] is None:
+            return _error(422, "no text could be extracted from the uploaded files")
+        return web.json_response(self._summary(corpus), status=201)
+
+    async def _store_corpus(self, corpus_id, files):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        corpus = await loop.run_in_executor(self.cpu_pool, self._build_corpus, files)
+        corpus.update({"id": corpus_id, "seconds": time.perf_counter() - start})
+        if corpus["vectorstore"] is None:
+            # Nothing to run agents on; not kept
+            return corpus
+        self.corpora[corpus_id] = corpus
+        while len(self.corpora) > self.max_corpora:
+            evicted, _ = self.corpora.popitem(last=False)
+            self._drop_sessions(evicted)
+        return corpus
+
+    async def get_corpus(self, request):
+        return web.json_response(self._summary(self._corpus(request)))
+
+    async def delete_corpus(self, request):
+        corpus = self._corpus(request)
+        del self.corpora[corpus["id"]]
+        self._drop_sessions(corpus["id"])
+        return web.json_response({"deleted": corpus["id"]})
+
+    def _drop_sessions(self, corpus_id):
+        for key in [key for key in self.sessions if key[0] == corpus_id]:
+            del self.sessions[key]
+
+    def _report_nodes(self, corpus, llm=None):
+        from document_processor import get_parsed_documents
+        from report_runner import build_report_nodes
+
+        return build_report_nodes(
+            llm or self.llm, corpus["documents"], get_parsed_documents(corpus["indexed_files"]), corpus["vectorstore"]
+        )
+
+    async def run_agent(self, request):
+        """POST /corpora/{id}/agents/{agent}: run one agent on the corpus"""
+        from report_runner import result_to_json
+
+        corpus = self._corpus(request)
+        agent = request.match_info["agent"]
+        if agent not in AGENTS:
+            return _error(404, f"unknown agent, expected one of: {', '.join(AGENTS)}")
+        start = time.perf_counter()
+        # Agents resolve their upstream artifacts themselves, so no inputs are passed
+        value = await asyncio.to_thread(self._report_nodes(corpus)[agent][1], {})
+        return web.json_response({
+            "corpus_id": corpus["id"],
+            "agent": agent,
+            "result": result_to_json(agent, value),
+            "seconds": time.perf_counter() - start,
+        })
+
+    async def report(self, request):
+        """POST /corpora/{id}/report: run every agent as a concurrent dependency graph"""
+        from report_runner import run_dag, result_to_json
+
+        corpus = self._corpus(request)
+        results = await run_dag(self._report_nodes(corpus, self._get_report_llm()))
+        return web.json_response({
+            "corpus_id": corpus["id"],
+            "sections": {
+                name: {
+                    "result": result_to_json(name, result["value"]) if result["error"] is None else None,
+                    "error": None if result["error"] is None else str(result["error"]),
+                    "seconds": result["seconds"],
+                }
+                for name, result in results.items()
+            },
+        })
+
+    async def chat(self, request):
+        """POST /corpora/{id}/chat: {"question", "session_id"?}; sessions keep history and retrieval caches"""
+        from chat_handler import ChatSession
+
+        corpus = self._corpus(request)
+        body = await self._json(request, "question")
+        session_id = body.get("session_id") or uuid.uuid4().hex
+        key = (corpus["id"], session_id)
+        if key not in self.sessions:
+            session = ChatSession(self._get_chat_llm(), corpus["vectorstore"], lexical_index=corpus["lexical_index"])
+            self.sessions[key] = (session, asyncio.Lock())
+            while len(self.sessions) > MAX_CHAT_SESSIONS:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(key)
+        session, lock = self.sessions[key]
+        # Questions of one session are answered in order
+        async with lock:
+            answer = await asyncio.to_thread(session.ask, body["question"])
+            timings = dict(session.last_timings)
+        return web.json_response({"corpus_id": corpus["id"], "session_id": session_id, "answer": answer,
+                                  "timings": timings})
+
+    async def translate(self, request):
+        """POST /translate: {"text", "language"}"""
+        from translator import translate_text
+
+        body = await self._json(request, "text", "language")
+        translation = await asyncio.to_thread(translate_text, self.llm, body["text"], body["language"])
+        return web.json_response({"language": body["language"], "translation": translation})
+
+    async def _cleanup(self, app):
+        self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+    def app(self):
+        """Build the aiohttp application"""
+        app = web.Application(middlewares=[self._backpressure], client_max_size=API_MAX_UPLOAD_MB * 1024 * 1024)
+        app.add_routes([
+            web.get("/health", self.health),
+            web.post("/corpora", self.create_corpus),
+            web.get("/corpora/{corpus_id}", self.get_corpus),
+            web.delete("/corpora/{corpus_id}", self.delete_corpus),
+            web.post("/corpora/{corpus_id}/agents/{agent}", self.run_agent),
+            web.post("/corpora/{corpus_id}/report", self.report),
+            web.post("/corpora/{corpus_id}/chat", self.chat),
+            web.post("/translate", self.translate),
+        ])
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Research assistant HTTP API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    web.run_app(AgentServer().app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from langchain.chains import LLMChain
+
+from tracing import span
+
+# Intermediate artifacts (summary, gaps, ...) shared by the downstream agents.
+# Keys are (artifact name, fingerprint of the document set and model), so
+# pressing "Run Agent" for another task on the same paper only pays for the
+# new LLM call.
+MAX_CACHED_ARTIFACTS = 64
+
+_artifacts = OrderedDict()
+_lock = threading.Lock()
+_inflight = {}
+
+def model_identity(llm):
+    """Model type and identifying parameters (name, temperature, ...) of a language model"""
+    if llm is None:
+        return ""
+    params = getattr(llm, "_identifying_params", {})
+    return json.dumps({"type": getattr(llm, "_llm_type", type(llm).__name__), **params}, sort_keys=True, default=str)
+
+def fingerprint_documents(documents, llm=None):
+    """
+    Compute a stable fingerprint for a set of document chunks and a model
+
+    Args:
+        documents: List of document chunks
+        llm: Language model the artifact is built with (optional)
+
+    Returns:
+        str: Hex digest identifying the document set and model
+    """
+    digest = hashlib.sha256()
+    digest.update(model_identity(llm).encode("utf-8"))
+    digest.update(b"\0")
+    for doc in documents:
+        digest.update(str(doc.metadata.get("source", "")).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def get_cached_artifact(name, fingerprint):
+    """Return a previously computed artifact, or None"""
+    with _lock:
+        key = (name, fingerprint)
+        if key not in _artifacts:
+            return None
+        _artifacts.move_to_end(key)
+        return _artifacts[key]
+
+def store_artifact(name, fingerprint, value):
+    """Store an artifact, evicting the least recently used ones"""
+    with _lock:
+        _artifacts[(name, fingerprint)] = value
+        _artifacts.move_to_end((name, fingerprint))
+        while len(_artifacts) > MAX_CACHED_ARTIFACTS:
+            _artifacts.popitem(last=False)
+
+def clear_artifacts():
+    """Drop every cached artifact"""
+    with _lock:
+        _artifacts.clear()
+
+def _build_summary(llm, documents, fingerprint):
+    from summarizer import build_summary
+    return build_summary(llm, documents)
+
+def _build_gaps(llm, documents, fingerprint):
+    from gap_analyzer import get_gap_prompt
+    summary = get_artifact("summary", llm, documents, fingerprint)
+    chain = LLMChain(llm=llm, prompt=get_gap_prompt())
+    return chain.invoke({"summary": summary})
+
+# Artifact name -> builder. Builders resolve their own upstream artifacts
+# through get_artifact, which forms the dependency graph.
+ARTIFACT_BUILDERS = {
+    "summary": _build_summary,
+    "gaps": _build_gaps,
+}
+
+def get_artifact(name, llm, documents, fingerprint=None):
+    """
+    Get a named intermediate artifact, computing it only once per document set
+
+    Args:
+        name: Artifact name (see ARTIFACT_BUILDERS)
+        llm: Language model instance
+        documents: List of document chunks
+        fingerprint: Precomputed fingerprint_documents(documents, llm) (optional)
+
+    Returns:
+        The artifact value as returned by its builder
+    """
+    if fingerprint is None:
+        fingerprint = fingerprint_documents(documents, llm)
+
+    with span(f"artifact:{name}") as current:
+        cached = get_cached_artifact(name, fingerprint)
+        if cached is not None:
+            current.set(cache_hit=True)
+            return cached
+
+        # Concurrent callers (e.g. agents running in parallel) wait for the
+        # first one instead of computing the same artifact twice
+        with _lock:
+            key_lock = _inflight.setdefault((name, fingerprint), threading.Lock())
+        try:
+            with key_lock:
+                cached = get_cached_artifact(name, fingerprint)
+                current.set(cache_hit=cached is not None)
+                if cached is None:
+                    cached = ARTIFACT_BUILDERS[name](llm, documents, fingerprint)
+                    store_artifact(name, fingerprint, cached)
+        finally:
+            # Also when the builder raises (rate limit, API error)
+            with _lock:
+                _inflight.pop((name, fingerprint), None)
+        return cached
+
+def artifact_text(value):
+    """Extract the generated text from a chain result"""
+    if isinstance(value, dict):
+        return value.get("text", "")
+    return str(value)
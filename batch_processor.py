@@ -0,0 +1,347 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Offline batch mode: index (and optionally analyze) every PDF under a directory.
+#
+# Output layout:
+#   <output>/checkpoint.jsonl                  one line per finished or failed paper
+#   <output>/papers/<file_hash>/chunks.jsonl   chunk text and metadata
+#   <output>/papers/<file_hash>/index/         FAISS index shard (FAISS.load_local)
+#   <output>/papers/<file_hash>/<agent>.json   agent outputs
+#
+# Every file is written atomically and synced to disk, and a paper is
+# checkpointed only after all of its outputs exist, so an interrupted run
+# resumes with the first paper that was not finished. Outputs already on disk
+# (index shard, agent results) are reused rather than recomputed.
+BATCH_FILES = int(os.getenv("BATCH_FILES", "16"))
+BATCH_MAX_MB = int(os.getenv("BATCH_MAX_MB", "256"))
+BATCH_AGENT_WORKERS = int(os.getenv("BATCH_AGENT_WORKERS", "4"))
+CHECKPOINT_NAME = "checkpoint.jsonl"
+
+class Checkpoint:
+    """Append-only progress log, safe against crashes mid-write"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # line cut short by a crash
+                    self.entries[entry["path"]] = entry
+        self._lock = threading.Lock()
+
+    def is_complete(self, path, stat, agents, retry_failed=False):
+        """Whether a file was already handled and has not changed since"""
+        entry = self.entries.get(path)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return False
+        if entry["status"] == "failed":
+            return not retry_failed
+        return set(agents) <= set(entry["agents"])
+
+    def record(self, entry):
+        """Append an entry and flush it to disk"""
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[entry["path"]] = entry
+
+def iter_pdfs(input_dir):
+    """
+    Walk a directory tree for PDF files in a stable order
+
+    Directories are listed one at a time, so huge trees are never held in
+    memory at once.
+
+    Args:
+        input_dir: Root directory
+
+    Yields:
+        str: Path of each PDF file
+    """
+    with os.scandir(input_dir) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_pdfs(entry.path)
+        elif entry.is_file() and entry.name.lower().endswith(".pdf"):
+            yield entry.path
+
+def iter_batches(input_dir, checkpoint, agents, max_files=BATCH_FILES, max_mb=BATCH_MAX_MB, retry_failed=False):
+    """
+    Group the files that still need processing into bounded batches
+
+    Args:
+        input_dir: Root directory
+        checkpoint: Checkpoint of previous runs
+        agents: Agent names to run on every paper
+        max_files: Maximum number of files per batch
+        max_mb: Maximum total file size per batch (a larger file forms its own batch)
+        retry_failed: Process files that failed in a previous run again
+
+    Yields:
+        list: List of (path, relative path, os.stat_result)
+    """
+    batch, size = [], 0
+    for path in iter_pdfs(input_dir):
+        rel = os.path.relpath(path, input_dir)
+        stat = os.stat(path)
+        if checkpoint.is_complete(rel, stat, agents, retry_failed):
+            continue
+        if batch and (len(batch) >= max_files or size + stat.st_size > max_mb * 1024 * 1024):
+            yield batch
+            batch, size = [], 0
+        batch.append((path, rel, stat))
+        size += stat.st_size
+    if batch:
+        yield batch
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_atomic(path, data):
+    # Flushed before the rename and the rename flushed after, so a paper
+    # checkpointed as done never points at an empty or missing file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path) or ".")
+
+def _remove_partial_outputs(papers_dir):
+    """Remove temporary files and index directories left behind by an interrupted run"""
+    with os.scandir(papers_dir) as papers:
+        paper_dirs = [entry.path for entry in papers if entry.is_dir(follow_symlinks=False)]
+    for paper_dir in paper_dirs:
+        with os.scandir(paper_dir) as it:
+            for entry in it:
+                if entry.name.startswith(".tmp-") and entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                elif entry.name.endswith(".tmp") and entry.is_file(follow_symlinks=False):
+                    os.remove(entry.path)
+
+def _parse_batch(batch, max_workers=None):
+    """Parse a batch across the process pool, isolating files that fail to parse"""
+    from document_processor import _parse_files, file_fingerprint
+
+    files = []
+    for path, rel, stat in batch:
+        with open(path, "rb") as f:
+            upload = io.BytesIO(f.read())
+        upload.name = rel
+        files.append((file_fingerprint(upload), upload))
+    try:
+        return [(parsed, None) for parsed in _parse_files(files, max_workers)[0]]
+    except Exception:
+        results = []
+        for file in files:
+            try:
+                results.append((_parse_files([file], max_workers)[0][0], None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+def _load_or_embed(chunks, embedding, index_path):
+    from langchain_community.vectorstores import FAISS
+    from document_processor import create_vector_store
+
+    if os.path.isdir(index_path):
+        try:
+            return FAISS.load_local(index_path, embedding, allow_dangerous_deserialization=True)
+        except Exception:
+            shutil.rmtree(index_path, ignore_errors=True)
+    vectorstore = create_vector_store(chunks, embedding, cache_dir=None)
+    tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(index_path))
+    vectorstore.save_local(tmp_path)
+    for name in os.listdir(tmp_path):
+        with open(os.path.join(tmp_path, name), "rb") as f:
+            os.fsync(f.fileno())
+    _fsync_dir(tmp_path)
+    os.replace(tmp_path, index_path)
+    _fsync_dir(os.path.dirname(index_path))
+    return vectorstore
+
+def _index_paper(parsed, paper_dir, embedding):
+    """Chunk a parsed paper and write its chunks and index shard"""
+    from document_processor import chunk_parsed_document
+
+    os.makedirs(paper_dir, exist_ok=True)
+    chunks = chunk_parsed_document(parsed)
+    chunks_path = os.path.join(paper_dir, "chunks.jsonl")
+    if not os.path.exists(chunks_path):
+        _write_atomic(chunks_path, "".join(
+            json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}) + "\n" for doc in chunks
+        ))
+    vectorstore = _load_or_embed(chunks, embedding, os.path.join(paper_dir, "index")) if chunks else None
+    return chunks, vectorstore
+
+def _run_agents(llm, parsed, chunks, vectorstore, paper_dir, agents):
+    """Run the agents whose output is not on disk yet"""
+    from report_runner import build_report_nodes, result_to_json
+
+    nodes = build_report_nodes(llm, chunks, [parsed], vectorstore)
+    for agent in agents:
+        path = os.path.join(paper_dir, f"{agent}.json")
+        if os.path.exists(path):
+            continue
+        start = time.perf_counter()
+        # Agents resolve their upstream artifacts themselves, so no inputs are passed
+        value = nodes[agent][1]({})
+        _write_atomic(path, json.dumps({
+            "agent": agent,
+            "source": parsed["name"],
+            "result": result_to_json(agent, value),
+            "seconds": time.perf_counter() - start,
+        }))
+
+def run_batch(input_dir, output_dir, embedding, llm=None, agents=(), max_files=BATCH_FILES, max_mb=BATCH_MAX_MB,
+              parse_workers=None, agent_workers=BATCH_AGENT_WORKERS, retry_failed=False, on_paper=None):
+    """
+    Index every PDF under a directory, resuming from the last checkpoint
+
+    Files are streamed in batches bounded by count and size. Each batch is
+    parsed across the process pool while the previous batch is embedded and
+    analyzed, so at most two batches are in memory at any time. Agents run
+    concurrently for the papers of a batch.
+
+    Args:
+        input_dir: Directory searched recursively for PDF files
+        output_dir: Output directory (see the layout at the top of this module)
+        embedding: Embedding model
+        llm: Language model instance (required when agents are given)
+        agents: Agent names to run on every paper (see REPORT_SECTIONS)
+        max_files: Maximum number of files per batch
+        max_mb: Maximum total file size per batch
+        parse_workers: Number of parsing processes (defaults to EXTRACTION_WORKERS)
+        agent_workers: Number of papers analyzed at once
+        retry_failed: Process files that failed in a previous run again
+        on_paper: Callback(entry) called as each paper is checkpointed (optional)
+
+    Returns:
+        dict: Counts of done, failed and skipped files, pages, chunks and seconds
+    """
+    start_time = time.perf_counter()
+    agents = list(agents)
+    os.makedirs(os.path.join(output_dir, "papers"), exist_ok=True)
+    _remove_partial_outputs(os.path.join(output_dir, "papers"))
+    checkpoint = Checkpoint(os.path.join(output_dir, CHECKPOINT_NAME))
+    previously_done = {path for path, entry in checkpoint.entries.items() if entry["status"] == "done"}
+    processed = set()
+    stats = {"done": 0, "failed": 0, "pages": 0, "chunks": 0}
+
+    def record(path, rel, stat, entry):
+        entry.update({"path": rel, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+        checkpoint.record(entry)
+        processed.add(rel)
+        stats[entry["status"]] += 1
+        stats["pages"] += entry.get("pages", 0)
+        stats["chunks"] += entry.get("chunks", 0)
+        if on_paper is not None:
+            on_paper(entry)
+
+    def analyze(parsed, chunks, vectorstore, paper_dir, started):
+        if chunks and agents:
+            _run_agents(llm, parsed, chunks, vectorstore, paper_dir, agents)
+        return {
+            "status": "done",
+            "file_hash": parsed["file_hash"],
+            "pages": len(parsed["pages"]),
+            "chunks": len(chunks),
+            "agents": agents,
+            "seconds": time.perf_counter() - started,
+        }
+
+    def finish(batch, results, agent_pool):
+        futures = {}
+        for item, (parsed, error) in zip(batch, results):
+            started = time.perf_counter()
+            if error is None:
+                try:
+                    paper_dir = os.path.join(output_dir, "papers", parsed["file_hash"])
+                    chunks, vectorstore = _index_paper(parsed, paper_dir, embedding)
+                    futures[agent_pool.submit(analyze, parsed, chunks, vectorstore, paper_dir, started)] = item
+                    continue
+                except Exception as e:
+                    error = e
+            record(*item, {"status": "failed", "error": f"{type(error).__name__}: {error}"})
+        for future in as_completed(futures):
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            record(*futures[future], entry)
+
+    with ThreadPoolExecutor(max_workers=1) as embed_pool, ThreadPoolExecutor(max_workers=agent_workers) as agent_pool:
+        pending = None
+        for batch in iter_batches(input_dir, checkpoint, agents, max_files, max_mb, retry_failed):
+            results = _parse_batch(batch, parse_workers)
+            if pending is not None:
+                pending.result()
+            pending = embed_pool.submit(finish, batch, results, agent_pool)
+            del results
+        if pending is not None:
+            pending.result()
+
+    stats.update({"skipped": len(previously_done - processed), "seconds": time.perf_counter() - start_time})
+    return stats
+
+def main():
+    from report_runner import REPORT_SECTIONS
+
+    parser = argparse.ArgumentParser(description="Index and analyze a directory of PDF papers, resumably")
+    parser.add_argument("input_dir", help="directory searched recursively for PDF files")
+    parser.add_argument("output_dir", help="directory for chunks, index shards, agent outputs and the checkpoint")
+    parser.add_argument("--agents", default="", help=f"comma-separated agents to run: {', '.join(REPORT_SECTIONS)}")
+    parser.add_argument("--batch-files", type=int, default=BATCH_FILES, help="files per batch")
+    parser.add_argument("--batch-mb", type=int, default=BATCH_MAX_MB, help="total file size per batch (MB)")
+    parser.add_argument("--parse-workers", type=int, default=None, help="parsing processes")
+    parser.add_argument("--agent-workers", type=int, default=BATCH_AGENT_WORKERS, help="papers analyzed at once")
+    parser.add_argument("--retry-failed", action="store_true", help="retry files that failed in a previous run")
+    args = parser.parse_args()
+
+    agents = [agent.strip() for agent in args.agents.split(",") if agent.strip()]
+    unknown = [agent for agent in agents if agent not in REPORT_SECTIONS]
+    if unknown:
+        parser.error(f"unknown agents: {', '.join(unknown)}")
+
+    from resources import get_embedding, get_llm
+    from llm_scheduler import BATCH
+
+    llm = get_llm(priority=BATCH) if agents else None
+
+    def on_paper(entry):
+        if entry["status"] == "done":
+            print(f"done    {entry['path']}: {entry['pages']} pages, {entry['chunks']} chunks, {entry['seconds']:.1f}s", flush=True)
+        else:
+            print(f"failed  {entry['path']}: {entry['error']}", flush=True)
+
+    stats = run_batch(
+        args.input_dir, args.output_dir, get_embedding(), llm, agents,
+        max_files=args.batch_files, max_mb=args.batch_mb, parse_workers=args.parse_workers,
+        agent_workers=args.agent_workers, retry_failed=args.retry_failed, on_paper=on_paper,
+    )
+    print(f"{stats['done']} done, {stats['failed']} failed, {stats['skipped']} already done; "
+          f"{stats['pages']} pages, {stats['chunks']} chunks in {stats['seconds']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+End-to-end load test of the HTTP API against the local fake LLM
+
+Starts api_server in-process on a free port with the deterministic fake
+LLM and embeddings, uploads synthetic papers, then fires concurrent agent,
+chat and translation requests and reports latency percentiles and how many
+requests were rejected by backpressure.
+
+    python benchmarks/bench_api_server.py --clients 32 --requests 200
+    python benchmarks/bench_api_server.py --max-inflight 4 --max-queue 4 --clients 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+from aiohttp import web
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from api_server import AgentServer, AGENTS
+from fake_llm import FakeChatModel
+from synthetic_pdfs import make_pdf
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+async def upload(session, base, pages, seed):
+    form = aiohttp.FormData()
+    form.add_field("files", make_pdf(pages, 0.2, seed), filename=f"paper{seed}.pdf", content_type="application/pdf")
+    async with session.post(f"{base}/corpora", data=form) as response:
+        body = await response.json()
+        assert response.status in (200, 201), body
+        return body
+
+async def call(session, base, corpus_id, rng):
+    kind = rng.choice(["agent", "chat", "chat", "translate"])
+    if kind == "agent":
+        request = session.post(f"{base}/corpora/{corpus_id}/agents/{rng.choice(AGENTS)}")
+    elif kind == "chat":
+        question = rng.choice(["What is the main result?", "Which baselines are used?", "What are the limitations?"])
+        request = session.post(f"{base}/corpora/{corpus_id}/chat", json={"question": question})
+    else:
+        request = session.post(f"{base}/translate", json={"text": "The method improves accuracy.", "language": "French"})
+    start = time.perf_counter()
+    async with request as response:
+        await response.read()
+        return kind, response.status, time.perf_counter() - start
+
+async def run(args):
+    llm = FakeChatModel(first_token_latency=args.llm_latency)
+    server = AgentServer(llm=llm, embedding=DeterministicFakeEmbedding(size=384),
+                         max_inflight=args.max_inflight, max_queue=args.max_queue)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            start = time.perf_counter()
+            corpus = await upload(session, base, args.pages, args.seed)
+            print(f"uploaded {corpus['files']}: {corpus['pages']} pages, {corpus['chunks']} chunks "
+                  f"in {time.perf_counter() - start:.2f}s")
+
+            rng = random.Random(args.seed)
+            queue = asyncio.Queue()
+            for _ in range(args.requests):
+                queue.put_nowait(None)
+            results = []
+
+            async def client():
+                while not queue.empty():
+                    queue.get_nowait()
+                    results.append(await call(session, base, corpus["corpus_id"], rng))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(args.clients)))
+            elapsed = time.perf_counter() - start
+
+            async with session.get(f"{base}/health") as response:
+                health = await response.json()
+    finally:
+        await runner.cleanup()
+
+    ok = [seconds for _, status, seconds in results if status == 200]
+    rejected = sum(1 for _, status, _ in results if status == 503)
+    failed = sum(1 for _, status, _ in results if status not in (200, 503))
+    print(f"{len(results)} requests from {args.clients} clients in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.1f} req/s): {len(ok)} ok, {rejected} rejected (503), {failed} failed")
+    if ok:
+        print(f"latency p50 {percentile(ok, 0.5) * 1000:.0f} ms  p95 {percentile(ok, 0.95) * 1000:.0f} ms  "
+              f"mean {statistics.mean(ok) * 1000:.0f} ms")
+    for kind in ("agent", "chat", "translate"):
+        times = [seconds for k, status, seconds in results if k == kind and status == 200]
+        if times:
+            print(f"  {kind:<10} {len(times):4d} ok  p50 {percentile(times, 0.5) * 1000:7.0f} ms")
+    print(f"server: {health}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--max-inflight", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM time to first token (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
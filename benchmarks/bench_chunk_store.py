@@ -0,0 +1,86 @@
+"""
+Benchmark the memory kept per session: Document lists vs the chunk store
+
+Builds the same corpus twice with deterministic fake embeddings, keeping
+everything a session keeps:
+  lists    Document list + FAISS InMemoryDocstore + LexicalIndex of Documents
+           + parsed documents with their page text
+  store    update_corpus: ChunkList + ChunkDocstore + LexicalIndex of rows
+           + indexed_files, whose page text is read from the chunk store
+and reports Python heap retained by each (tracemalloc; FAISS vectors live in
+native memory and are the same for both), plus the cost of materializing
+chunks and of a similarity search.
+
+    python benchmarks/bench_chunk_store.py --papers 20 --pages 12
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Disable the on-disk index cache so both variants embed
+os.environ["VECTOR_CACHE_DIR"] = ""
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from document_processor import parse_pdfs, chunk_parsed_document, update_corpus, _chunk_ids
+from hybrid_retriever import LexicalIndex
+from synthetic_pdfs import make_upload
+
+def retained(build):
+    """Run build() and return (result, bytes of Python heap it keeps alive)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def timed(fn, repeats=5):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=12)
+    args = parser.parse_args()
+
+    embedding = DeterministicFakeEmbedding(size=384)
+    uploads = [make_upload(f"paper{i}.pdf", args.pages, 0.2, seed=i) for i in range(args.papers)]
+
+    # Exactly what a session keeps is returned
+    def build_lists():
+        parsed_documents = parse_pdfs(uploads)
+        documents = [doc for entry in parsed_documents for doc in chunk_parsed_document(entry)]
+        vectorstore = FAISS.from_documents(documents, embedding, ids=_chunk_ids(documents))
+        return documents, vectorstore, LexicalIndex(documents), parsed_documents
+
+    def build_store():
+        documents, vectorstore, indexed_files, lexical_index, _ = update_corpus(uploads, embedding)
+        return documents, vectorstore, lexical_index, indexed_files
+
+    lists, lists_bytes = retained(build_lists)
+    store, store_bytes = retained(build_store)
+    chunks = len(lists[0])
+    text_mb = sum(len(doc.page_content.encode("utf-8")) for doc in lists[0]) / 1e6
+
+    print(f"{args.papers} papers x {args.pages} pages: {chunks} chunks, {text_mb:.1f} MB of chunk text")
+    print(f"{'variant':<8} {'heap MB':>9} {'per chunk':>10} {'iterate':>10} {'search':>9}")
+    for name, (documents, vectorstore, _, _), size in (("lists", lists, lists_bytes), ("store", store, store_bytes)):
+        iterate = timed(lambda: sum(len(doc.page_content) for doc in documents))
+        search = timed(lambda: vectorstore.similarity_search("results accuracy baseline", k=8), repeats=20)
+        print(f"{name:<8} {size / 1e6:9.2f} {size / chunks:9.0f}B {iterate * 1000:8.1f}ms {search * 1000:7.2f}ms")
+    print(f"chunk store text file: {store[0].store.nbytes / 1e6:.1f} MB of page and chunk text "
+          f"(memory-mapped, outside the heap)")
+
+if __name__ == "__main__":
+    main()
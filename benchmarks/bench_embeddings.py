@@ -0,0 +1,122 @@
+"""
+Benchmark the embedding backend: throughput and retrieval-quality drift
+
+Chunks come from synthetic PDFs, with a share of them replaced by
+boilerplate that repeats across papers (headers, license text, reference
+entries). For each runtime, reports throughput of:
+  raw      the encoder alone in fixed batches of 32 (HuggingFaceEmbeddings defaults)
+  cold     CachedEmbeddings with an empty cache (dedupe + adaptive batches)
+  warm     the same corpus again (a re-upload served from the cache)
+and, against the torch runtime, the cosine similarity of the vectors and
+the overlap of the top-k chunks retrieved for each query.
+
+    python benchmarks/bench_embeddings.py --runtimes torch,int8,onnx
+    python benchmarks/bench_embeddings.py --runtimes fake --papers 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from document_processor import parse_pdfs, chunk_parsed_document
+from embedding_backend import CachedEmbeddings, EmbeddingCache, SentenceTransformerEmbeddings
+from synthetic_pdfs import make_upload
+
+BOILERPLATE = [
+    "Preprint. Under review. Do not distribute.",
+    "This work is licensed under a Creative Commons Attribution 4.0 International License. "
+    "To view a copy of this license, visit http://creativecommons.org/licenses/by/4.0/.",
+    "Proceedings of the 40th International Conference on Machine Learning, Honolulu, Hawaii, USA. "
+    "PMLR 202, 2023. Copyright 2023 by the author(s).",
+    "[1] A. Vaswani, N. Shazeer, N. Parmar, et al. Attention is all you need. In Advances in Neural "
+    "Information Processing Systems, pages 5998-6008, 2017.",
+    "[2] J. Devlin, M. Chang, K. Lee, and K. Toutanova. BERT: Pre-training of deep bidirectional "
+    "transformers for language understanding. In NAACL-HLT, pages 4171-4186, 2019.",
+]
+
+def make_chunks(papers, pages, duplicate_rate, seed=0):
+    uploads = [make_upload(f"paper{i}.pdf", pages, 0.2, seed=i) for i in range(papers)]
+    texts = [doc.page_content for entry in parse_pdfs(uploads) for doc in chunk_parsed_document(entry)]
+    rng = random.Random(seed)
+    for i in rng.sample(range(len(texts)), int(duplicate_rate * len(texts))):
+        texts[i] = rng.choice(BOILERPLATE)
+    return texts
+
+def load_encoder(runtime, model_name):
+    if runtime == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)
+    return SentenceTransformerEmbeddings(model_name, runtime=runtime)
+
+def embed_raw(encoder, texts, batch_size=32):
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(encoder.embed_documents(texts[start:start + batch_size]))
+    return np.asarray(vectors, dtype=np.float32)
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def top_k(vectors, queries, k):
+    scores = normalize(queries) @ normalize(vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--runtimes", default="torch,int8,onnx")
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--duplicate-rate", type=float, default=0.15)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    texts = make_chunks(args.papers, args.pages, args.duplicate_rate)
+    rng = random.Random(1)
+    # Queries are the opening words of random chunks
+    queries = [" ".join(text.split()[:12]) for text in rng.sample(texts, min(args.queries, len(texts)))]
+    print(f"{len(texts)} chunks ({len(set(texts))} distinct), {len(queries)} queries, top-{args.k} overlap vs torch")
+    print(f"{'runtime':<8} {'raw/s':>8} {'cold/s':>8} {'warm/s':>9} {'batches':>8} {'dupes':>6} "
+          f"{'cos mean':>9} {'cos min':>8} {'overlap':>8}")
+
+    reference = None
+    for runtime in args.runtimes.split(","):
+        try:
+            encoder = load_encoder(runtime, args.model)
+        except ImportError as e:
+            print(f"{runtime:<8} skipped: {e}")
+            continue
+        raw, raw_seconds = timed(lambda: embed_raw(encoder, texts))
+        with tempfile.TemporaryDirectory() as tmp:
+            cached = CachedEmbeddings(encoder, EmbeddingCache(os.path.join(tmp, "embeddings.sqlite")))
+            cold, cold_seconds = timed(lambda: np.asarray(cached.embed_documents(texts), dtype=np.float32))
+            batches, duplicates = cached.stats["batches"], cached.stats["duplicates"]
+            _, warm_seconds = timed(lambda: cached.embed_documents(texts))
+            query_vectors = np.asarray([cached.embed_query(query) for query in queries], dtype=np.float32)
+        assert np.allclose(raw, cold, atol=1e-4), f"{runtime}: cached vectors differ from the encoder's"
+
+        drift = ""
+        if runtime == "torch":
+            reference = (cold, top_k(cold, query_vectors, args.k))
+        elif reference is not None and runtime != "fake":
+            cosines = np.sum(normalize(cold) * normalize(reference[0]), axis=1)
+            found = top_k(cold, query_vectors, args.k)
+            overlap = np.mean([len(set(f) & set(r)) / args.k for f, r in zip(found, reference[1])])
+            drift = f"{cosines.mean():9.4f} {cosines.min():8.4f} {overlap:8.3f}"
+        print(f"{runtime:<8} {len(texts) / raw_seconds:8.0f} {len(texts) / cold_seconds:8.0f} "
+              f"{len(texts) / warm_seconds:9.0f} {batches:8d} {duplicates:6d} {drift}")
+
+if __name__ == "__main__":
+    main()
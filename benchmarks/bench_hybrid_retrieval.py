@@ -0,0 +1,123 @@
+"""
+Benchmark dense vs BM25 vs hybrid retrieval on a synthetic paper corpus
+
+Each chunk mixes generic academic prose with rare exact terms (dataset
+names, author names, symbols). Queries ask about one of those terms, and
+the chunk that contains it is the single relevant result.
+
+    python benchmarks/bench_hybrid_retrieval.py --chunks 2000 --queries 200
+    python benchmarks/bench_hybrid_retrieval.py --latency-chunks 10000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from hybrid_retriever import LexicalIndex, reciprocal_rank_fusion
+
+WORDS = (
+    "model method result dataset training evaluation baseline performance accuracy analysis "
+    "approach network learning experiment proposed significant improvement feature layer "
+    "representation task benchmark previous work study data sample distribution parameter "
+    "optimization loss function metric score table figure section appendix robust efficient"
+).split()
+SURNAMES = ["Okonkwo", "Varga", "Nakashima", "Lindqvist", "Abernathy", "Quispe", "Haddad", "Kowalczyk"]
+
+def make_corpus(chunks, seed=0):
+    """Generate synthetic chunks, each containing one unique exact term"""
+    rng = random.Random(seed)
+    documents = []
+    terms = []
+    for i in range(chunks):
+        kind = i % 3
+        if kind == 0:
+            term = f"{rng.choice(['CORA', 'XSum', 'MIMIC', 'SQuAD', 'GLUE'])}-{rng.randint(100, 99999)}"
+        elif kind == 1:
+            term = f"{rng.choice(SURNAMES)}{rng.randint(10, 9999)}"
+        else:
+            term = f"lambda_{rng.randint(100, 99999)}"
+        words = [rng.choice(WORDS) for _ in range(150)]
+        words.insert(rng.randint(0, len(words)), term)
+        documents.append(Document(page_content=" ".join(words), metadata={"chunk_id": f"c-{i}"}))
+        terms.append(term)
+    return documents, terms
+
+def recall_at_k(results, targets, k):
+    hits = sum(1 for docs, target in zip(results, targets) if target in [d.metadata["chunk_id"] for d in docs[:k]])
+    return hits / len(targets)
+
+def load_embedding(name):
+    if name == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=name)
+
+def run_recall(args):
+    documents, terms = make_corpus(args.chunks, args.seed)
+    rng = random.Random(args.seed + 1)
+    picks = rng.sample(range(len(documents)), min(args.queries, len(documents)))
+    queries = [f"What results are reported for {terms[i]}?" for i in picks]
+    targets = [f"c-{i}" for i in picks]
+
+    embedding = load_embedding(args.embedding)
+    vectorstore = FAISS.from_documents(documents, embedding)
+    lexical_index = LexicalIndex(documents)
+
+    dense, lexical, hybrid = [], [], []
+    for query in queries:
+        vector = embedding.embed_query(query)
+        dense_docs = vectorstore.similarity_search_by_vector(vector, k=args.candidates)
+        lexical_docs = [doc for doc, _ in lexical_index.search(query, args.candidates)]
+        dense.append(dense_docs)
+        lexical.append(lexical_docs)
+        hybrid.append(reciprocal_rank_fusion([dense_docs, lexical_docs]))
+
+    print(f"Recall on {len(documents)} chunks, {len(queries)} queries (embedding: {args.embedding})")
+    for k in (1, 4, 10):
+        print(
+            f"  recall@{k:<2}  dense {recall_at_k(dense, targets, k):.3f}  "
+            f"bm25 {recall_at_k(lexical, targets, k):.3f}  hybrid {recall_at_k(hybrid, targets, k):.3f}"
+        )
+
+def run_latency(args):
+    documents, terms = make_corpus(args.latency_chunks, args.seed)
+    start = time.perf_counter()
+    lexical_index = LexicalIndex(documents)
+    lexical_index.search("warm up", 1)
+    build = time.perf_counter() - start
+
+    rng = random.Random(args.seed + 2)
+    timings = []
+    for _ in range(args.queries):
+        query = f"What results are reported for {rng.choice(terms)} on the benchmark dataset?"
+        start = time.perf_counter()
+        lexical_index.search(query, args.candidates)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"BM25 on {len(documents)} chunks: build {build:.2f}s, "
+          f"query p50 {statistics.median(timings):.2f} ms, p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000, help="corpus size for the recall benchmark")
+    parser.add_argument("--latency-chunks", type=int, default=10000, help="corpus size for the latency benchmark")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--embedding", default="all-MiniLM-L6-v2", help="embedding model, or 'fake' for offline runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-recall", action="store_true")
+    args = parser.parse_args()
+
+    run_latency(args)
+    if not args.skip_recall:
+        run_recall(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Offline throughput test of the LLM scheduler against the fake backend
+
+The fake model enforces its own requests-per-minute limit and answers
+with a fixed latency, so the run shows how many calls hit 429s, how many
+were retried, and the sustained throughput under the scheduler's limits.
+
+    python benchmarks/bench_llm_scheduler.py --calls 60 --provider-rpm 120 --scheduler-rpm 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_llm import FakeChatModel
+from llm_scheduler import LLMScheduler, ScheduledChatModel, INTERACTIVE, BATCH
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake time to first token in seconds")
+    parser.add_argument("--provider-rpm", type=float, default=120, help="requests per minute the fake backend accepts")
+    parser.add_argument("--scheduler-rpm", type=float, default=100)
+    parser.add_argument("--scheduler-tpm", type=float, default=1_000_000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--interactive-share", type=float, default=0.25, help="fraction of calls sent at INTERACTIVE priority")
+    args = parser.parse_args()
+
+    backend = FakeChatModel(first_token_latency=args.latency, requests_per_minute=args.provider_rpm)
+    scheduler = LLMScheduler(
+        requests_per_minute=args.scheduler_rpm,
+        tokens_per_minute=args.scheduler_tpm,
+        max_concurrency=args.concurrency,
+        base_delay=0.25,
+        seed=0,
+    )
+    batch_llm = ScheduledChatModel(llm=backend, scheduler=scheduler, priority=BATCH)
+    interactive_llm = batch_llm.with_priority(INTERACTIVE)
+    every = max(1, round(1 / args.interactive_share)) if args.interactive_share else 0
+
+    latencies = {"interactive": [], "batch": []}
+    failures = []
+
+    def one_call(i):
+        interactive = every and i % every == 0
+        start = time.perf_counter()
+        try:
+            (interactive_llm if interactive else batch_llm).invoke(f"question {i}")
+        except Exception as e:
+            failures.append(e)
+            return
+        latencies["interactive" if interactive else "batch"].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(one_call, range(args.calls)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.calls} calls in {elapsed:.1f}s ({args.calls / elapsed * 60:.0f} calls/min), {len(failures)} failed")
+    print(f"scheduler: {scheduler.stats}")
+    print(f"backend 429s: {backend.state['rate_limited']} of {backend.state['calls']} requests")
+    for kind, values in latencies.items():
+        if values:
+            print(f"{kind:>11}: p50 {statistics.median(values):.2f}s, max {max(values):.2f}s over {len(values)} calls")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark the single-pass numeric extractor against per-pattern regex scans
+
+The baseline is the previous extract_numbers_with_regex: seven patterns,
+each rebuilt and run over the full text, followed by a second re.findall
+per match to get float values for the charts.
+
+    python benchmarks/bench_numeric_extraction.py --pages 100 --repeats 20
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from document_processor import parse_pdfs
+from numeric_extractor import extract_numbers
+from synthetic_pdfs import make_upload
+
+def legacy_extract(text):
+    patterns = [
+        r'\b\d+\.?\d*%',
+        r'\b\d+\.?\d*\s*(?:participants|subjects|samples|cases)',
+        r'p\s*[<>=]\s*\d+\.?\d*',
+        r'\b\d+\.?\d*\s*±\s*\d+\.?\d*',
+        r'\$\d+\.?\d*[MBK]?',
+        r'\b\d{4}\b',
+        r'\b\d+\.?\d*\s*(?:kg|g|cm|m|mm|seconds?|minutes?|hours?|days?)',
+    ]
+    found_numbers = []
+    for pattern in patterns:
+        found_numbers.extend(re.findall(pattern, text, re.IGNORECASE))
+    return found_numbers
+
+def legacy_pipeline(text):
+    # Called twice per visual insights run, then percentages re-parsed
+    numbers = legacy_extract(text)
+    legacy_extract(text[:2000])
+    return [float(re.findall(r'\d+\.?\d*', num)[0]) for num in numbers if '%' in num]
+
+def new_pipeline(parsed):
+    records = list(extract_numbers(parsed["pages"], parsed["page_offsets"]))
+    return [record.value for record in records if record.kind == "percentage"]
+
+def timeit(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    parsed = parse_pdfs([make_upload("bench.pdf", args.pages, 0.0, args.seed)])[0]
+    text = "\n".join(parsed["pages"])
+    records = list(extract_numbers(parsed["pages"], parsed["page_offsets"]))
+    kinds = {}
+    for record in records:
+        kinds[record.kind] = kinds.get(record.kind, 0) + 1
+    print(f"{args.pages} pages, {len(text)} characters, {len(records)} records: {kinds}")
+
+    legacy = timeit(lambda: legacy_pipeline(text), args.repeats)
+    new = timeit(lambda: new_pipeline(parsed), args.repeats)
+    print(f"legacy (7 scans + 2nd call + re-parse) {legacy * 1000:8.2f} ms")
+    print(f"single pass, typed records             {new * 1000:8.2f} ms  ({legacy / new:.1f}x)")
+    print(f"percentages: legacy {len(legacy_pipeline(text))}, new {len(new_pipeline(parsed))}")
+
+if __name__ == "__main__":
+    main()
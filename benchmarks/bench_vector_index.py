@@ -0,0 +1,84 @@
+"""
+Benchmark the vector index kinds against the exact flat index
+
+Vectors are drawn around random cluster centers in a low-dimensional
+latent space and projected to the embedding dimension, like sentence
+embeddings of papers on related topics (isotropic noise in all 384
+dimensions would understate what quantization can keep). Queries are
+perturbed copies of held-out vectors. For each index kind and search
+effort, reports index size, build time (training included), single-query
+latency and recall@k against the flat index.
+
+    python benchmarks/bench_vector_index.py --vectors 100000 --dim 384
+    python benchmarks/bench_vector_index.py --kinds flat,ivf_sq,ivf_pq --efforts 0.02,0.05,0.1,0.3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+from vector_index import build_index, index_factory_string, set_search_effort, INDEX_KINDS
+
+def make_vectors(count, dim, clusters, latent=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, latent)).astype(np.float32)
+    points = centers[rng.integers(clusters, size=count)] + 0.8 * rng.standard_normal((count, latent)).astype(np.float32)
+    projection = rng.standard_normal((latent, dim)).astype(np.float32) / np.sqrt(latent)
+    vectors = points @ projection + 0.03 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", default=",".join(INDEX_KINDS))
+    parser.add_argument("--efforts", default="0.02,0.1,0.3")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads (1 matches one chat query)")
+    args = parser.parse_args()
+    faiss.omp_set_num_threads(args.threads)
+
+    data = make_vectors(args.vectors + args.queries, args.dim, args.clusters)
+    vectors, held_out = data[:args.vectors], data[args.vectors:]
+    queries = held_out + 0.01 * np.random.default_rng(1).standard_normal(held_out.shape).astype(np.float32)
+
+    exact = build_index(vectors, "flat")
+    _, truth = exact.search(queries, args.k)
+    flat_bytes = len(faiss.serialize_index(exact))
+
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k}")
+    print(f"{'kind':<9} {'factory':<26} {'effort':>6} {'size MB':>8} {'x flat':>7} {'build s':>8} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'recall':>7}")
+    for kind in args.kinds.split(","):
+        start = time.perf_counter()
+        index = build_index(vectors, kind)
+        build_seconds = time.perf_counter() - start
+        size = len(faiss.serialize_index(index))
+        efforts = [None] if kind == "flat" else [float(effort) for effort in args.efforts.split(",")]
+        for effort in efforts:
+            if effort is not None:
+                set_search_effort(index, effort)
+            latencies, found = [], []
+            for query in queries:
+                start = time.perf_counter()
+                _, labels = index.search(query[None, :], args.k)
+                latencies.append(time.perf_counter() - start)
+                found.append(labels[0])
+            latencies.sort()
+            print(f"{kind:<9} {index_factory_string(kind, args.vectors, args.dim):<26} "
+                  f"{'-' if effort is None else f'{effort:.2f}':>6} {size / 1e6:8.1f} {flat_bytes / size:6.1f}x "
+                  f"{build_seconds:8.2f} {statistics.median(latencies) * 1000:7.2f} "
+                  f"{latencies[int(0.95 * (len(latencies) - 1))] * 1000:7.2f} {recall_at_k(found, truth):7.3f}")
+
+if __name__ == "__main__":
+    main()
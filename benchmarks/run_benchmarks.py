@@ -0,0 +1,226 @@
+"""
+Offline benchmark suite covering every pipeline stage
+
+Generates synthetic PDFs, then measures PDF processing, vector store
+creation, numeric extraction, chart creation and every agent function
+against the deterministic fake LLM (fixed latency, no network). Reports
+throughput, p50/p95 latency and peak resident memory per stage, and saves
+the results as JSON so runs can be compared for regressions.
+
+    python benchmarks/run_benchmarks.py --pages 40 --files 4 --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdfs import make_upload
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+def max_rss_mb(who=resource.RUSAGE_SELF):
+    """High-water mark of resident memory in MB (for RUSAGE_CHILDREN, of the largest finished child)"""
+    maxrss = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+def measure(fn, repeats, items=1, setup=None):
+    """
+    Measure the peak memory of one run of fn, then time it over several runs
+
+    Memory is resident set size, so it covers native allocations (FAISS,
+    numpy, tokenizers) as well as the Python heap. The process high-water
+    mark cannot be reset, so a stage also reports how much it raised it;
+    worker processes (PDF parsing pools) are reported separately.
+
+    Args:
+        fn: Function to benchmark
+        repeats: Number of timed runs
+        items: Items processed per run (pages, chunks, ...) for throughput
+        setup: Function called before every run, outside the timing (optional)
+
+    Returns:
+        dict: Latency percentiles in ms, throughput in items/s and peak RSS in MB
+    """
+    # The memory run goes first: after the timed runs the high-water mark
+    # would already include this stage
+    if setup:
+        setup()
+    rss_before = max_rss_mb()
+    fn()
+    rss_after = max_rss_mb()
+
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    mean = statistics.mean(timings)
+    return {
+        "repeats": repeats,
+        "items": items,
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "mean_ms": mean * 1000,
+        "throughput_per_s": items / mean if mean > 0 else 0.0,
+        "peak_rss_mb": rss_after,
+        "rss_growth_mb": rss_after - rss_before,
+        "workers_peak_rss_mb": max_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+def load_embedding(name):
+    if name == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=name)
+
+def run(args):
+    from artifact_pipeline import clear_artifacts
+    from chart_renderer import render_plotly, render_matplotlib, clear_figure_cache
+    from chat_handler import chat_with_paper
+    from citation_generator import generate_citation
+    from debate_simulator import simulate_debate
+    from document_processor import process_pdfs, parse_pdfs, create_vector_store
+    from fake_llm import FakeChatModel
+    from gap_analyzer import identify_research_gaps
+    from idea_generator import suggest_research_ideas
+    from summarizer import summarize_document
+    import translator
+    from visualization import (
+        extract_numerical_data_from_pdf, extract_numbers_with_regex, create_sample_charts, generate_visual_insights,
+        clear_frame_cache,
+    )
+
+    uploads = [
+        make_upload(f"paper{i}.pdf", args.pages, args.table_density, seed=args.seed + i) for i in range(args.files)
+    ]
+    pages = args.pages * args.files
+    llm = FakeChatModel(first_token_latency=args.llm_latency, token_latency=args.token_latency)
+    embedding = load_embedding(args.embedding)
+    repeats = args.repeats
+    stages = {}
+
+    def stage(name, fn, items=1, setup=None, runs=repeats):
+        stages[name] = measure(fn, runs, items, setup)
+        result = stages[name]
+        print(f"{name:<34} p50 {result['p50_ms']:9.1f} ms  p95 {result['p95_ms']:9.1f} ms  "
+              f"{result['throughput_per_s']:9.1f} items/s  rss {result['peak_rss_mb']:7.1f} MB "
+              f"(+{result['rss_growth_mb']:.1f}, workers {result['workers_peak_rss_mb']:.1f})")
+
+    # Document processing
+    documents = process_pdfs(uploads)
+    parsed = parse_pdfs(uploads)
+    stage("process_pdfs", lambda: process_pdfs(uploads), items=pages)
+    stage("create_vector_store", lambda: create_vector_store(documents, embedding, cache_dir=None), items=len(documents))
+    vectorstore = create_vector_store(documents, embedding, cache_dir=None)
+
+    # Visual data extraction
+    extracted = extract_numerical_data_from_pdf(parsed)
+    # Tables and typed frames are cached per parsed document, so every run
+    # starts from a fresh parse (outside the timing) to measure extraction
+    fresh = {}
+
+    def fresh_parse():
+        fresh["parsed"] = parse_pdfs(uploads)
+        clear_frame_cache()
+
+    stage("extract_numerical_data_from_pdf", lambda: extract_numerical_data_from_pdf(fresh["parsed"]), items=pages,
+          setup=fresh_parse)
+    stage("extract_numbers_with_regex", lambda: extract_numbers_with_regex(extracted["raw_text"]), items=pages)
+
+    def charts():
+        chart, _ = create_sample_charts(extracted)
+        return render_plotly(chart), render_matplotlib(chart)
+    # Figures are cached per chart, so the cache is cleared to measure rendering
+    stage("create_sample_charts", charts, setup=clear_figure_cache)
+
+    # Agents against the fake LLM; the artifact cache is cleared so every run pays the full cost
+    agent_docs = documents[:10]
+    agents = {
+        "agent:summarize_document": lambda: summarize_document(llm, documents),
+        "agent:identify_research_gaps": lambda: identify_research_gaps(llm, documents),
+        "agent:suggest_research_ideas": lambda: suggest_research_ideas(llm, documents),
+        "agent:simulate_debate": lambda: simulate_debate(llm, documents),
+        "agent:generate_citation": lambda: generate_citation(llm, agent_docs),
+        "agent:translate_text": lambda: translator.translate_text(llm, extracted["raw_text"][:20000], "Spanish"),
+        "agent:chat_with_paper": lambda: chat_with_paper(llm, vectorstore, "What are the main results?"),
+        "agent:generate_visual_insights": lambda: generate_visual_insights(llm, parsed),
+    }
+
+    def reset():
+        clear_artifacts()
+        translator._segment_cache.clear()
+
+    for name, fn in agents.items():
+        stage(name, fn, setup=reset, runs=args.agent_repeats)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "chunks": len(documents),
+        },
+        "stages": stages,
+    }
+
+def compare(results, baseline_path, threshold):
+    """Print p50 changes against a baseline run; return the stages that regressed"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["stages"]
+    regressions = []
+    print(f"\nComparison with {baseline_path} (threshold {threshold:.0%}):")
+    for name, result in results["stages"].items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50_ms"], result["p50_ms"]
+        change = (after - before) / before if before > 0 else 0.0
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"  {name:<34} {before:9.1f} -> {after:9.1f} ms  {change:+7.1%}  {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic PDF")
+    parser.add_argument("--files", type=int, default=2, help="number of synthetic PDFs")
+    parser.add_argument("--table-density", type=float, default=0.2, help="fraction of pages holding a table")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per pipeline stage")
+    parser.add_argument("--agent-repeats", type=int, default=3, help="timed runs per agent")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake LLM delay per token (s)")
+    parser.add_argument("--embedding", default="fake", help="embedding model name, or 'fake' for offline runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Series longer than this are downsampled with LTTB before plotting
+MAX_CHART_POINTS = int(os.getenv("MAX_CHART_POINTS", "500"))
+# Up to this many points are drawn as bars, longer series as lines
+MAX_BAR_POINTS = 20
+# Rendered figures kept per (chart, backend)
+MAX_CACHED_FIGURES = 32
+
+_figure_cache = OrderedDict()
+_figure_lock = threading.Lock()
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket, which preserves peaks and trends.
+
+    Args:
+        x: Numeric x values, increasing
+        y: Numeric y values
+        threshold: Number of points to keep
+
+    Returns:
+        ndarray: Indices of the kept points
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+def chart_spec(title, x, y, x_label="Data Points", y_label="Values"):
+    """
+    Describe a chart without building any figure
+
+    Missing values are plotted as 0. Long series are downsampled with LTTB
+    to MAX_CHART_POINTS and drawn as lines instead of bars.
+
+    Args:
+        title: Chart title
+        x: x values or labels
+        y: Numeric y values
+        x_label: x axis label
+        y_label: y axis label
+
+    Returns:
+        dict: Chart spec for render_plotly / render_matplotlib
+    """
+    x = np.asarray(x)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    points = len(y)
+    if points > MAX_CHART_POINTS:
+        keep = lttb(np.arange(points), y, MAX_CHART_POINTS)
+        x, y = x[keep], y[keep]
+    digest = hashlib.sha1(f"{title}|{x_label}|{y_label}|".encode("utf-8"))
+    digest.update(repr(x.tolist()).encode("utf-8"))
+    digest.update(y.tobytes())
+    return {
+        "key": digest.hexdigest(),
+        "kind": "bar" if points <= MAX_BAR_POINTS else "line",
+        "title": title,
+        "x": x.tolist(),
+        "y": y.tolist(),
+        "x_label": x_label,
+        "y_label": y_label,
+        "points": points,
+    }
+
+def message_spec(title, message):
+    """Describe a chart that only shows a message"""
+    return {
+        "key": hashlib.sha1(f"{title}|{message}".encode("utf-8")).hexdigest(),
+        "kind": "message",
+        "title": title,
+        "message": message,
+    }
+
+def _cached(spec, backend, build):
+    key = (spec["key"], backend)
+    with _figure_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+    figure = build(spec)
+    with _figure_lock:
+        _figure_cache[key] = figure
+        while len(_figure_cache) > MAX_CACHED_FIGURES:
+            _figure_cache.popitem(last=False)
+    return figure
+
+def _build_plotly(spec):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    if spec["kind"] == "message":
+        fig.add_annotation(
+            text=spec["message"].replace("\n", "<br>"),
+            xref="paper", yref="paper",
+            x=0.5, y=0.5, xanchor='center', yanchor='middle',
+            showarrow=False, font=dict(size=16)
+        )
+    elif spec["kind"] == "bar":
+        fig.add_trace(go.Bar(x=spec["x"], y=spec["y"], marker_color='#1f77b4'))
+    else:
+        fig.add_trace(go.Scattergl(x=list(range(len(spec["y"]))), y=spec["y"], mode="lines",
+                                   text=spec["x"], line=dict(color='#1f77b4')))
+    fig.update_layout(title=spec["title"], xaxis_title=spec.get("x_label"), yaxis_title=spec.get("y_label"))
+    return fig
+
+def _build_matplotlib(spec):
+    # A Figure outside pyplot is not tracked by its global figure manager,
+    # so it is freed as soon as it is cleared here
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    if spec["kind"] == "message":
+        ax.text(0.5, 0.5, spec["message"], transform=ax.transAxes, ha='center', va='center', fontsize=12)
+        ax.axis('off')
+    elif spec["kind"] == "bar":
+        ax.bar(range(len(spec["y"])), spec["y"])
+    else:
+        ax.plot(range(len(spec["y"])), spec["y"], linewidth=1)
+    ax.set_title(spec["title"])
+    if spec["kind"] != "message":
+        ax.set_xlabel(spec["x_label"])
+        ax.set_ylabel(spec["y_label"])
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    fig.clear()
+    return buffer.getvalue()
+
+def render_plotly(spec):
+    """Build (or reuse) the Plotly figure of a chart spec"""
+    return _cached(spec, "plotly", _build_plotly)
+
+def render_matplotlib(spec):
+    """
+    Render (or reuse) the Matplotlib image of a chart spec
+
+    The figure is drawn to PNG and released immediately, so only the image
+    bytes are kept.
+
+    Returns:
+        bytes: PNG image
+    """
+    return _cached(spec, "matplotlib", _build_matplotlib)
+
+def downsample_note(spec):
+    """Caption for a downsampled chart, or an empty string"""
+    if spec.get("points", 0) > len(spec.get("y", ())):
+        return f"Showing {len(spec['y'])} of {spec['points']} points (LTTB downsampling)"
+    return ""
+
+def clear_figure_cache():
+    """Drop every rendered figure"""
+    with _figure_lock:
+        _figure_cache.clear()
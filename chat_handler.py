@@ -1,4 +1,151 @@
-from langchain.chains import RetrievalQA
+import re
+import time
+from collections import OrderedDict, deque
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from hybrid_retriever import hybrid_search
+from tracing import span, traced, annotate
+
+def get_qa_prompt():
+    """Get the prompt template for conversational question answering over retrieved chunks"""
+    return ChatPromptTemplate.from_template("""
+Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+<context>
+{context}
+</context>
+Conversation so far:
+{history}
+Question: {question}
+Helpful Answer:""")
+
+def normalize_query(query):
+    """Normalize a question so near-duplicates share cache entries"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+class ChatSession:
+    """
+    Persistent conversational retrieval session over one vector store
+    
+    The chain is built once, the last few exchanges are kept as conversation
+    memory, and query embeddings and top-k results are cached so repeated
+    and near-duplicate questions skip embedding and FAISS search. With a
+    lexical index, retrieval fuses BM25 with dense similarity, optionally
+    followed by a cross-encoder reranker.
+    """
+
+    def __init__(self, llm, vectorstore, k=4, history_size=6, cache_size=256, lexical_index=None, reranker=None):
+        self.vectorstore = vectorstore
+        self.lexical_index = lexical_index
+        self.reranker = reranker
+        self.k = k
+        self.cache_size = cache_size
+        self.chain = get_qa_prompt() | llm | StrOutputParser()
+        self.history = deque(maxlen=history_size)
+        self._embedding_cache = OrderedDict()
+        self._retrieval_cache = OrderedDict()
+        # Latency of the last question in seconds: embed, search, generate
+        self.last_timings = {}
+
+    def _cache_get(self, cache, key):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        return None
+
+    def _cache_put(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _embed_query(self, query):
+        embedding = self.vectorstore.embedding_function
+        if hasattr(embedding, "embed_query"):
+            return embedding.embed_query(query)
+        return embedding(query)
+
+    @traced("retrieve")
+    def retrieve(self, query):
+        """
+        Retrieve the top-k chunks for a question, using the caches when possible
+        
+        Args:
+            query: User's question
+            
+        Returns:
+            list: List of document chunks
+        """
+        key = normalize_query(query)
+        
+        start = time.perf_counter()
+        documents = self._cache_get(self._retrieval_cache, (key, self.k))
+        annotate(k=self.k, cache_hit=documents is not None)
+        if documents is not None:
+            self.last_timings.update({"embed": 0.0, "search": 0.0})
+            return documents
+        
+        vector = self._cache_get(self._embedding_cache, key)
+        with span("embed_query", cache_hit=vector is not None):
+            if vector is None:
+                vector = self._embed_query(query)
+                self._cache_put(self._embedding_cache, key, vector)
+        embedded = time.perf_counter()
+        
+        with span("search", hybrid=self.lexical_index is not None, reranked=self.reranker is not None):
+            if self.lexical_index is not None:
+                documents = hybrid_search(
+                    query, self.vectorstore, self.lexical_index, k=self.k, query_vector=vector, reranker=self.reranker
+                )
+            else:
+                documents = self.vectorstore.similarity_search_by_vector(vector, k=self.k)
+        self._cache_put(self._retrieval_cache, (key, self.k), documents)
+        self.last_timings.update({"embed": embedded - start, "search": time.perf_counter() - embedded})
+        return documents
+
+    def _inputs(self, query, documents):
+        history = "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in self.history)
+        return {
+            "context": "\n\n".join(doc.page_content for doc in documents),
+            "history": history or "(none)",
+            "question": query,
+        }
+
+    def ask(self, query):
+        """
+        Answer a question about the paper
+        
+        Args:
+            query: User's question
+            
+        Returns:
+            str: Answer to the question
+        """
+        self.last_timings = {}
+        documents = self.retrieve(query)
+        start = time.perf_counter()
+        answer = self.chain.invoke(self._inputs(query, documents))
+        self.last_timings["generate"] = time.perf_counter() - start
+        self.history.append((query, answer))
+        return answer
+
+    def ask_stream(self, query):
+        """
+        Answer a question about the paper, yielding tokens as they arrive
+        
+        Args:
+            query: User's question
+            
+        Yields:
+            str: Answer tokens
+        """
+        self.last_timings = {}
+        documents = self.retrieve(query)
+        start = time.perf_counter()
+        parts = []
+        for token in self.chain.stream(self._inputs(query, documents)):
+            parts.append(token)
+            yield token
+        self.last_timings["generate"] = time.perf_counter() - start
+        self.history.append((query, "".join(parts)))
 
 def chat_with_paper(llm, vectorstore, query):
     """
@@ -12,6 +159,18 @@ def chat_with_paper(llm, vectorstore, query):
     Returns:
         str: Answer to the question
     """
-    retriever = vectorstore.as_retriever()
-    qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=retriever)
-    return qa_chain.run(query)
\ No newline at end of file
+    return ChatSession(llm, vectorstore).ask(query)
+
+def chat_with_paper_stream(llm, vectorstore, query):
+    """
+    Chat with the paper using Q&A, yielding answer tokens as they arrive
+    
+    Args:
+        llm: Language model instance
+        vectorstore: FAISS vector store
+        query: User's question
+        
+    Yields:
+        str: Answer tokens
+    """
+    yield from ChatSession(llm, vectorstore).ask_stream(query)
\ No newline at end of file
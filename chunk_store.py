@@ -0,0 +1,328 @@
+import json
+import mmap
+import os
+import tempfile
+import threading
+from array import array
+from collections.abc import Sequence
+from langchain_core.documents import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+# Directory of the chunk text files (defaults to the system temp directory).
+# The files are unlinked on creation and vanish with their store.
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR") or None
+
+# Metadata set per chunk by chunk_parsed_document; everything else is shared
+# by the chunks of a file and interned
+_ROW_FIELDS = ("start_index", "chunk_id", "page")
+
+class ChunkStore:
+    """
+    Append-only chunk store: text in one memory-mapped file, metadata in arrays
+
+    Chunk text is written once to an unlinked temporary file and read back
+    through mmap, so it lives in the page cache instead of the Python heap.
+    Files added with add_file keep their page text there too, and their
+    chunks point into it rather than repeating it. Per-chunk fields
+    (offsets, start index, page, chunk number) are kept in typed arrays, and
+    metadata shared by a file's chunks is stored once. Chunks are addressed
+    by integer row; Document objects are only built by document() when a
+    chain needs them.
+    """
+
+    def __init__(self, directory=CHUNK_STORE_DIR):
+        self._file = tempfile.TemporaryFile(prefix="chunks-", dir=directory)
+        self._mmap = None
+        self._size = 0
+        self.offsets = array("q")
+        self.lengths = array("i")
+        self.start_indexes = array("q")  # -1 when absent
+        self.pages = array("i")  # -1 when absent
+        self.numbers = array("i")  # n of a "<file_hash>-<n>" chunk_id, -1 otherwise
+        self.meta_ids = array("i")
+        self.live = bytearray()
+        self._metas = []  # interned shared metadata
+        self._meta_keys = {}
+        self._file_rows = {}  # file_hash -> row of its chunk number 0
+        self._other_ids = {}  # chunk_id -> row, for IDs not derived from the file hash
+        self._row_ids = {}  # row -> chunk_id, same chunks
+        self._pages = {}  # file_hash -> (page offsets, page lengths) in the text file
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.live) - self.live.count(0)
+
+    def _intern(self, metadata):
+        key = json.dumps(metadata, sort_keys=True, default=str)
+        meta_id = self._meta_keys.get(key)
+        if meta_id is None:
+            meta_id = self._meta_keys[key] = len(self._metas)
+            self._metas.append(metadata)
+        return meta_id
+
+    def _write(self, data):
+        offset = self._size
+        self._file.write(data)
+        self._size += len(data)
+        return offset
+
+    def add(self, documents):
+        """
+        Append document chunks
+
+        Args:
+            documents: List of document chunks
+
+        Returns:
+            list: Rows of the new chunks
+        """
+        with self._lock:
+            return self._add(documents, [None] * len(documents))
+
+    def add_file(self, file_hash, pages, documents):
+        """
+        Append the page text of a file and its chunks, storing the text once
+
+        The pages are written joined with newlines, the text the chunks were
+        split from (see chunk_parsed_document); a chunk found at its
+        start_index in that text is stored as a reference into it.
+
+        Args:
+            file_hash: SHA-256 of the file
+            pages: List of page texts
+            documents: Chunks of the file
+
+        Returns:
+            list: Rows of the new chunks
+        """
+        with self._lock:
+            page_offsets, page_lengths = array("q"), array("i")
+            for number, page in enumerate(pages):
+                data = page.encode("utf-8")
+                page_offsets.append(self._write(data + b"\n" if number < len(pages) - 1 else data))
+                page_lengths.append(len(data))
+            self._pages[file_hash] = (page_offsets, page_lengths)
+
+            text = "\n".join(pages)
+            base = page_offsets[0] if pages else self._size
+            ascii_text = len(text) == self._size - base
+            spans = []
+            position = position_bytes = 0
+            for doc in documents:
+                start = doc.metadata.get("start_index", -1)
+                content = doc.page_content
+                if start < 0 or not text.startswith(content, start):
+                    spans.append(None)
+                    continue
+                if ascii_text:
+                    start_bytes = start
+                else:
+                    # Chunks come in text order, so byte offsets are counted incrementally
+                    if start < position:
+                        position = position_bytes = 0
+                    position_bytes += len(text[position:start].encode("utf-8"))
+                    position, start_bytes = start, position_bytes
+                spans.append((base + start_bytes, len(content.encode("utf-8"))))
+            return self._add(documents, spans)
+
+    def _add(self, documents, spans):
+        rows = []
+        for doc, span in zip(documents, spans):
+            row = len(self.live)
+            metadata = doc.metadata
+            if span is None:
+                data = doc.page_content.encode("utf-8")
+                span = (self._write(data), len(data))
+            self.offsets.append(span[0])
+            self.lengths.append(span[1])
+            self.start_indexes.append(metadata.get("start_index", -1))
+            self.pages.append(metadata.get("page", -1))
+            shared = {key: value for key, value in metadata.items() if key not in _ROW_FIELDS}
+            self.meta_ids.append(self._intern(shared))
+
+            chunk_id = metadata.get("chunk_id")
+            file_hash, _, number = (chunk_id or "").rpartition("-")
+            if chunk_id is not None and file_hash == shared.get("file_hash") and number.isdigit():
+                # Chunks of a file are added together, in chunk order
+                if int(number) == 0:
+                    self._file_rows[file_hash] = row
+                self.numbers.append(int(number))
+            else:
+                self.numbers.append(-1)
+                if chunk_id is not None:
+                    self._other_ids[chunk_id] = row
+                    self._row_ids[row] = chunk_id
+            self.live.append(1)
+            rows.append(row)
+        self._file.flush()
+        return rows
+
+    def row(self, chunk_id):
+        """Row of a live chunk by chunk_id, or None"""
+        row = self._other_ids.get(chunk_id)
+        if row is None:
+            file_hash, _, number = chunk_id.rpartition("-")
+            first = self._file_rows.get(file_hash)
+            if first is None or not number.isdigit():
+                return None
+            row = first + int(number)
+            if (row >= len(self.live) or self.numbers[row] != int(number)
+                    or self._metas[self.meta_ids[row]].get("file_hash") != file_hash):
+                return None
+        return row if self.live[row] else None
+
+    def chunk_id(self, row):
+        """chunk_id of a row, or None"""
+        if self.numbers[row] >= 0:
+            return f"{self._metas[self.meta_ids[row]]['file_hash']}-{self.numbers[row]}"
+        return self._row_ids.get(row)
+
+    def remove(self, chunk_ids):
+        """Mark chunks as removed; their text stays in the file until the store is dropped"""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                row = self.row(chunk_id)
+                if row is not None:
+                    self.live[row] = 0
+
+    def text(self, row):
+        """Text of a chunk, read from the memory-mapped file"""
+        return self._read(self.offsets[row], self.lengths[row])
+
+    def page_text(self, file_hash, index):
+        """Text of page index (0-based) of a file added with add_file"""
+        offsets, lengths = self._pages[file_hash]
+        return self._read(offsets[index], lengths[index])
+
+    def file_pages(self, file_hash):
+        """PageList of a file added with add_file"""
+        return PageList(self, file_hash, len(self._pages[file_hash][0]))
+
+    def _read(self, offset, length):
+        if length == 0:
+            return ""
+        view = self._mmap
+        if view is None or offset + length > len(view):
+            with self._lock:
+                if self._mmap is None or len(self._mmap) < self._size:
+                    self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                view = self._mmap
+        return view[offset:offset + length].decode("utf-8")
+
+    def metadata(self, row):
+        """Metadata dict of a chunk, in the layout written by chunk_parsed_document"""
+        metadata = dict(self._metas[self.meta_ids[row]])
+        if self.start_indexes[row] >= 0:
+            metadata["start_index"] = self.start_indexes[row]
+        chunk_id = self.chunk_id(row)
+        if chunk_id is not None:
+            metadata["chunk_id"] = chunk_id
+        if self.pages[row] >= 0:
+            metadata["page"] = self.pages[row]
+        return metadata
+
+    def document(self, row):
+        """Materialize a chunk as a Document"""
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+    def chunks(self):
+        """ChunkList of every live chunk, in insertion order"""
+        return ChunkList(self, [row for row, alive in enumerate(self.live) if alive])
+
+    @property
+    def nbytes(self):
+        """Size of the text file (page and chunk text)"""
+        return self._size
+
+class ChunkList(Sequence):
+    """
+    Read-only list of chunks backed by a ChunkStore
+
+    Behaves like the list of Documents the chains expect, but holds only
+    integer rows; each item is materialized when accessed.
+    """
+
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = array("q", rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ChunkList(self.store, self.rows[index])
+        return self.store.document(self.rows[index])
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self.store.document(row)
+
+    def __repr__(self):
+        return f"ChunkList({len(self)} chunks)"
+
+class PageList(Sequence):
+    """Read-only list of the page texts of a file, read from a ChunkStore on access"""
+
+    def __init__(self, store, file_hash, count):
+        self.store = store
+        self.file_hash = file_hash
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("page index out of range")
+        return self.store.page_text(self.file_hash, index)
+
+    def __repr__(self):
+        return f"PageList({self.count} pages)"
+
+class ChunkDocstore(Docstore, AddableMixin):
+    """FAISS docstore that resolves IDs to chunks of a ChunkStore instead of keeping Documents"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, texts):
+        """Add documents that are not in the store yet"""
+        self.store.add([doc for chunk_id, doc in texts.items() if self.store.row(chunk_id) is None])
+
+    def search(self, search):
+        row = self.store.row(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self.store.document(row)
+
+    def delete(self, ids):
+        self.store.remove(ids)
+
+    def __reduce__(self):
+        # Saved indexes (FAISS.save_local) keep a plain in-memory docstore
+        chunks = self.store.chunks()
+        return InMemoryDocstore, ({doc.metadata.get("chunk_id", str(row)): doc for row, doc in zip(chunks.rows, chunks)},)
+
+def attach_chunk_store(vectorstore, store):
+    """
+    Make a FAISS vector store read its documents from a ChunkStore
+
+    Every document of the vector store must already be in the chunk store;
+    the store's own copy is dropped.
+
+    Args:
+        vectorstore: FAISS vector store
+        store: ChunkStore holding the indexed chunks
+
+    Returns:
+        FAISS: The same vector store
+    """
+    if not isinstance(vectorstore.docstore, ChunkDocstore):
+        vectorstore.docstore = ChunkDocstore(store)
+    return vectorstore
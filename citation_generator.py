@@ -23,4 +23,18 @@ def generate_citation(llm, documents):
     """
     citation_prompt = get_citation_prompt()
     citation_chain = create_stuff_documents_chain(llm, citation_prompt)
-    return citation_chain.invoke({"context": documents})
\ No newline at end of file
+    return citation_chain.invoke({"context": documents})
+
+def generate_citation_stream(llm, documents):
+    """
+    Generate APA-style citation for the document, yielding tokens as they arrive
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        
+    Yields:
+        str: APA citation tokens
+    """
+    citation_chain = create_stuff_documents_chain(llm, get_citation_prompt())
+    yield from citation_chain.stream({"context": documents})
\ No newline at end of file
@@ -0,0 +1,139 @@
+import re
+import numpy as np
+
+# Llama3-8b-8192 context window and the share kept free for the completion
+CONTEXT_WINDOW = 8192
+RESERVED_OUTPUT_TOKENS = 1024
+# Per-chunk formatting overhead added by the stuff chain (separators)
+CHUNK_OVERHEAD_TOKENS = 2
+
+_encoding = None
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+def count_tokens(text):
+    """
+    Count tokens with a local BPE tokenizer
+
+    Uses tiktoken's cl100k_base (close to the Llama 3 vocabulary) when it is
+    available, and a word/punctuation estimate otherwise.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly 1.3 BPE tokens per word or punctuation mark
+    return int(len(_WORD_PATTERN.findall(text)) * 1.3) + 1
+
+def prompt_tokens(prompt):
+    """Count the tokens of a prompt template without its variables"""
+    return sum(count_tokens(message.prompt.template) for message in prompt.messages if hasattr(message, "prompt"))
+
+def context_budget(prompt, reserved_output_tokens=RESERVED_OUTPUT_TOKENS, context_window=CONTEXT_WINDOW):
+    """
+    Tokens left for context once the prompt and the completion are accounted for
+
+    Args:
+        prompt: ChatPromptTemplate the context is inserted into
+        reserved_output_tokens: Tokens kept free for the completion
+        context_window: Model context window
+
+    Returns:
+        int: Context token budget
+    """
+    return context_window - reserved_output_tokens - prompt_tokens(prompt)
+
+def _document_vectors(vectorstore, documents):
+    """Look up the stored embeddings of documents in the FAISS index, or None"""
+    positions = {docstore_id: i for i, docstore_id in vectorstore.index_to_docstore_id.items()}
+    vectors = []
+    for doc in documents:
+        position = positions.get(doc.metadata.get("chunk_id"))
+        if position is None:
+            return None
+        vectors.append(vectorstore.index.reconstruct(position))
+    return np.array(vectors, dtype=np.float32)
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def pack_context(documents, prompt, vectorstore=None, query=None, token_budget=None, lambda_mult=0.7):
+    """
+    Pick relevant, non-redundant chunks that fit the prompt's token budget
+
+    Chunks are selected with maximal marginal relevance over the embeddings
+    already stored in the FAISS index: relevance to the query (or to the
+    centroid of the document when there is no query) traded off against
+    similarity to chunks already selected. Without a vector store, chunks
+    are taken in document order.
+
+    Args:
+        documents: List of document chunks
+        prompt: ChatPromptTemplate the chunks are inserted into
+        vectorstore: FAISS vector store holding the chunk embeddings (optional)
+        query: Text the chunks should be relevant to (optional)
+        token_budget: Context token budget (defaults to context_budget(prompt))
+        lambda_mult: Relevance vs diversity trade-off, 1 is pure relevance
+
+    Returns:
+        tuple: (selected chunks in document order, budget report dict)
+    """
+    if token_budget is None:
+        token_budget = context_budget(prompt)
+    tokens = [count_tokens(doc.page_content) + CHUNK_OVERHEAD_TOKENS for doc in documents]
+
+    vectors = _document_vectors(vectorstore, documents) if vectorstore is not None and documents else None
+    if vectors is None:
+        selected = []
+        used = 0
+        for i in range(len(documents)):
+            if used + tokens[i] <= token_budget:
+                selected.append(i)
+                used += tokens[i]
+    else:
+        vectors = _normalize(vectors)
+        if query:
+            target = np.asarray(vectorstore.embedding_function.embed_query(query), dtype=np.float32)
+        else:
+            target = vectors.mean(axis=0)
+        relevance = vectors @ _normalize(target)
+
+        token_counts = np.array(tokens)
+        selected = []
+        used = 0
+        redundancy = np.zeros(len(documents), dtype=np.float32)
+        available = token_counts <= token_budget
+        while available.any():
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            used += tokens[best]
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+            available[best] = False
+            available &= token_counts <= token_budget - used
+
+    selected.sort()
+    report = {
+        "budget": token_budget,
+        "used": used,
+        "utilization": used / token_budget if token_budget > 0 else 0.0,
+        "chunks": len(selected),
+        "candidates": len(documents),
+    }
+    return [documents[i] for i in selected], report
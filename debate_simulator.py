@@ -1,7 +1,7 @@
-from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import LLMChain
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from summarizer import get_summary_prompt
+from artifact_pipeline import get_artifact
 
 def get_debate_prompt():
     """Get the prompt template for debate simulation"""
@@ -25,12 +25,25 @@ def simulate_debate(llm, documents):
     Returns:
         str: Debate conversation
     """
-    # First get summary
-    summary_prompt = get_summary_prompt()
-    chain = create_stuff_documents_chain(llm, summary_prompt)
-    summary = chain.invoke({"context": documents})
+    # First get summary (shared with the other agents)
+    summary = get_artifact("summary", llm, documents)
     
     # Then simulate debate
     debate_prompt = get_debate_prompt()
     debate_chain = LLMChain(llm=llm, prompt=debate_prompt)
-    return debate_chain.invoke({"summary": summary})
\ No newline at end of file
+    return debate_chain.invoke({"summary": summary})
+
+def simulate_debate_stream(llm, documents):
+    """
+    Simulate a debate about the document, yielding tokens as they arrive
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        
+    Yields:
+        str: Debate conversation tokens
+    """
+    summary = get_artifact("summary", llm, documents)
+    chain = get_debate_prompt() | llm | StrOutputParser()
+    yield from chain.stream({"summary": summary})
\ No newline at end of file
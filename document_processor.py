@@ -1,7 +1,357 @@
+import bisect
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 import PyPDF2
 from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from chunk_store import ChunkStore, attach_chunk_store
+from hybrid_retriever import LexicalIndex
+from vector_index import choose_index_kind, fit_index, from_documents, remove_vectors, set_search_effort
+from tracing import span, traced, annotate
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Bump when the chunk text or metadata layout changes, to invalidate cached indexes
+CHUNK_FORMAT_VERSION = 4
+
+# Page-parallel parsing: each worker task parses a range of pages of one file
+PAGES_PER_TASK = 16
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or os.cpu_count() or 1
+
+# Table extraction is far slower per page than text extraction
+TABLE_PAGES_PER_TASK = 4
+# One lock per file hash being extracted: [lock, number of callers holding or waiting]
+_table_locks = {}
+_table_locks_guard = threading.Lock()
+
+# On-disk FAISS index cache, keyed by PDF bytes, chunking parameters and embedding model
+VECTOR_CACHE_DIR = os.getenv("VECTOR_CACHE_DIR", os.path.join(".cache", "vectorstores"))
+VECTOR_CACHE_MAX_MB = int(os.getenv("VECTOR_CACHE_MAX_MB", "1024"))
+
+# PDFs with table candidates wait here, keyed by content hash, until load_tables needs them
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(".cache", "pdfs"))
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "512"))
+
+def file_fingerprint(file):
+    """
+    Hash the raw bytes of an uploaded file
+    
+    Args:
+        file: Uploaded file (file-like object)
+        
+    Returns:
+        str: SHA-256 hex digest of the file contents
+    """
+    file.seek(0)
+    digest = hashlib.sha256(file.read()).hexdigest()
+    file.seek(0)
+    return digest
+
+def _read_bytes(file):
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return data
+
+def _spool_pdf(file_hash, data, cache_dir=PDF_CACHE_DIR, max_mb=PDF_CACHE_MAX_MB):
+    """
+    Keep the bytes of a PDF on disk until its tables are extracted
+    
+    Args:
+        file_hash: SHA-256 of the PDF bytes
+        data: PDF bytes
+        cache_dir: PDF cache directory
+        max_mb: Size limit in megabytes; least recently used PDFs are removed past it
+        
+    Returns:
+        str: Path of the cached PDF
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{file_hash}.pdf")
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used
+        return path
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=cache_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".pdf"):
+            entry = os.path.join(cache_dir, name)
+            entries.append((os.path.getmtime(entry), entry, os.path.getsize(entry)))
+    total = sum(size for _, _, size in entries)
+    for _, entry, size in sorted(entries):
+        if total <= max_mb * 1024 * 1024:
+            break
+        if entry != path:
+            os.remove(entry)
+            total -= size
+    return path
+
+def _read_spooled_pdf(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+# Content stream operators that draw ruling lines: "x y m x y l" segments and rectangles
+_STRING_LITERAL = re.compile(rb"\((?:\\.|[^\\)])*\)")
+_NUMBER = rb"(-?\d*\.?\d+)"
+_SEGMENT = re.compile(_NUMBER + rb"\s+" + _NUMBER + rb"\s+m\s+" + _NUMBER + rb"\s+" + _NUMBER + rb"\s+l\b")
+_RECTANGLE = re.compile(rb"\bre\b")
+
+def _has_ruling_lines(page):
+    """
+    Whether a page draws the ruling lines that pdfplumber's default (lines)
+    table finder needs, i.e. whether extract_tables() can find anything
+
+    Scans the raw content stream instead of laying out the page, so it costs
+    far less than pdfplumber's edge detection; pages it flags are only
+    candidates for load_tables.
+    """
+    contents = page.get_contents()
+    if contents is None:
+        return False
+    data = _STRING_LITERAL.sub(b"", contents.get_data())
+    # Every rectangle has two horizontal and two vertical edges
+    if _RECTANGLE.search(data):
+        return True
+    horizontal = vertical = 0
+    for x0, y0, x1, y1 in _SEGMENT.findall(data):
+        if y0 == y1:
+            horizontal += 1
+        elif x0 == x1:
+            vertical += 1
+        if horizontal >= 2 and vertical >= 2:
+            return True
+    return False
+
+def _parse_page_range(data, start, stop):
+    """Parse pages [start, stop) of a PDF into text and a table flag (runs in a worker process)"""
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [
+        {"text": page.extract_text() or "", "table_candidate": _has_ruling_lines(page)}
+        for page in reader.pages[start:stop]
+    ]
+
+def _extract_page_tables(data, page_numbers):
+    """Extract the tables of the given 1-based pages of a PDF (runs in a worker process)"""
+    import pdfplumber
+
+    tables = []
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        for number in page_numbers:
+            page = pdf.pages[number - 1]
+            tables.extend(
+                {"page": number, "rows": table} for table in page.extract_tables() if table and len(table) > 1
+            )
+            page.close()
+    return tables
+
+def _pool_size(tasks, max_workers):
+    """Number of worker processes _run_tasks uses for these tasks (1 means in-process)"""
+    return min(max_workers, len(tasks)) if max_workers > 1 and len(tasks) > 1 else 1
+
+def _run_tasks(fn, tasks, max_workers):
+    """Run fn(*args) for every task, across a process pool when there is more than one task"""
+    workers = _pool_size(tasks, max_workers)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(fn, *args) for args in tasks]
+            return [future.result() for future in futures]
+    return [fn(*args) for args in tasks]
+
+@traced("parse_pdfs")
+def _parse_files(files, max_workers=None):
+    """
+    Parse PDF files into page text across a process pool
+    
+    Files are split into page ranges so that both many small files and a
+    few long ones keep every core busy. Tables are not extracted here: pages
+    that may hold one are flagged, and load_tables extracts only those on
+    first use.
+    
+    Args:
+        files: List of (file_hash, uploaded file) pairs
+        max_workers: Number of worker processes (defaults to EXTRACTION_WORKERS)
+        
+    Returns:
+        tuple: (list of parsed documents, one per file, dict of extraction statistics)
+    """
+    start_time = time.perf_counter()
+    max_workers = max_workers or EXTRACTION_WORKERS
+    
+    tasks = []
+    file_data = []
+    for index, (_, file) in enumerate(files):
+        data = _read_bytes(file)
+        file_data.append(data)
+        page_count = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+        for start in range(0, page_count, PAGES_PER_TASK):
+            tasks.append((index, data, start, min(start + PAGES_PER_TASK, page_count)))
+    
+    results = [[] for _ in files]
+    workers = _pool_size(tasks, max_workers)
+    task_pages = _run_tasks(_parse_page_range, [(data, start, stop) for _, data, start, stop in tasks], max_workers)
+    for (index, _, _, _), pages in zip(tasks, task_pages):
+        results[index].extend(pages)
+    
+    parsed_documents = []
+    for (file_hash, file), data, pages in zip(files, file_data, results):
+        page_texts = [page["text"] for page in pages]
+        page_offsets = []
+        offset = 0
+        for text in page_texts:
+            page_offsets.append(offset)
+            offset += len(text) + 1
+        table_pages = [number for number, page in enumerate(pages, start=1) if page["table_candidate"]]
+        parsed_documents.append({
+            "name": file.name,
+            "file_hash": file_hash,
+            "pages": page_texts,
+            "page_offsets": page_offsets,
+            "table_pages": table_pages,
+            # Extracted by load_tables, which re-reads the PDF from the disk cache
+            "tables": None if table_pages else [],
+            "pdf_path": _spool_pdf(file_hash, data) if table_pages else None,
+        })
+    
+    elapsed = time.perf_counter() - start_time
+    page_total = sum(len(pages) for pages in results)
+    stats = {
+        "files": len(files),
+        "pages": page_total,
+        "seconds": elapsed,
+        "pages_per_second": page_total / elapsed if elapsed > 0 else 0.0,
+        "workers": workers,
+        "table_pages": sum(len(parsed["table_pages"]) for parsed in parsed_documents),
+    }
+    annotate(files=len(files), pages=page_total, workers=workers)
+    return parsed_documents, stats
+
+@traced("extract_tables")
+def load_tables(parsed_documents, max_workers=None):
+    """
+    Extract the tables of parsed documents, on first use
+    
+    Only the pages flagged at parse time are extracted, in parallel across
+    a process pool. The tables are stored in the parsed documents, so later
+    calls return immediately.
+    
+    Args:
+        parsed_documents: List of parsed documents (see parse_pdfs)
+        max_workers: Number of worker processes (defaults to EXTRACTION_WORKERS)
+        
+    Returns:
+        list: The same parsed documents, with "tables" filled in
+    """
+    file_hashes = sorted({parsed["file_hash"] for parsed in parsed_documents if parsed.get("tables") is None})
+    if not file_hashes:
+        return parsed_documents
+    # Only callers extracting the same files wait for each other; locks are
+    # taken in hash order so overlapping calls cannot deadlock
+    with _table_locks_guard:
+        locks = []
+        for file_hash in file_hashes:
+            entry = _table_locks.setdefault(file_hash, [threading.Lock(), 0])
+            entry[1] += 1
+            locks.append(entry[0])
+    held = []
+    try:
+        for lock in locks:
+            lock.acquire()
+            held.append(lock)
+        _extract_pending_tables(parsed_documents, max_workers)
+    finally:
+        for lock in reversed(held):
+            lock.release()
+        with _table_locks_guard:
+            for file_hash in file_hashes:
+                entry = _table_locks[file_hash]
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del _table_locks[file_hash]
+    return parsed_documents
+
+def _extract_pending_tables(parsed_documents, max_workers):
+    # Another caller may have filled them while this one waited
+    pending = [parsed for parsed in parsed_documents if parsed.get("tables") is None]
+    if not pending:
+        return
+    tasks = []
+    for index, parsed in enumerate(pending):
+        # None when the PDF was evicted from the cache: no tables then
+        data = _read_spooled_pdf(parsed["pdf_path"])
+        pages = parsed["table_pages"] if data is not None else []
+        for start in range(0, len(pages), TABLE_PAGES_PER_TASK):
+            tasks.append((index, data, pages[start:start + TABLE_PAGES_PER_TASK]))
+    
+    results = [[] for _ in pending]
+    task_tables = _run_tasks(
+        _extract_page_tables, [(data, pages) for _, data, pages in tasks], max_workers or EXTRACTION_WORKERS
+    )
+    for (index, _, _), tables in zip(tasks, task_tables):
+        results[index].extend(tables)
+    for parsed, tables in zip(pending, results):
+        parsed["tables"] = tables
+        parsed["pdf_path"] = None
+    annotate(pages=sum(len(pages) for _, _, pages in tasks), tables=sum(len(tables) for tables in results))
+
+def parse_pdfs(uploaded_files, max_workers=None):
+    """
+    Parse uploaded PDF files once into page text and page offsets
+    
+    The parsed documents are shared by the chunker and the visual insights
+    agent, so the uploads do not need to be kept or parsed again. Tables
+    are extracted lazily by load_tables.
+    
+    Args:
+        uploaded_files: List of uploaded PDF files
+        max_workers: Number of worker processes (optional)
+        
+    Returns:
+        list: List of dicts with name, file_hash, pages, page_offsets, table_pages and tables
+    """
+    return _parse_files([(file_fingerprint(file), file) for file in uploaded_files], max_workers)[0]
+
+@traced("split")
+def chunk_parsed_document(parsed):
+    """
+    Split a parsed document into chunks
+    
+    Pages are joined once (no repeated concatenation) and each chunk records
+    the page it starts on, its character offset and a stable chunk_id
+    derived from the file hash, which is also used as its vector store ID.
+    
+    Args:
+        parsed: Parsed document (see parse_pdfs)
+        
+    Returns:
+        list: List of document chunks
+    """
+    document = Document(
+        page_content="\n".join(parsed["pages"]),
+        metadata={"source": parsed["name"], "file_hash": parsed["file_hash"]},
+    )
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True)
+    chunks = splitter.split_documents([document])
+    for i, chunk in enumerate(chunks):
+        chunk.metadata["chunk_id"] = f"{parsed['file_hash']}-{i}"
+        chunk.metadata["page"] = bisect.bisect_right(parsed["page_offsets"], chunk.metadata["start_index"])
+    annotate(source=parsed["name"], chunks=len(chunks))
+    return chunks
 
 def process_pdfs(uploaded_files):
     """
@@ -14,25 +364,232 @@ def process_pdfs(uploaded_files):
         list: List of document chunks
     """
     documents = []
-    for file in uploaded_files:
-        reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        documents.append(Document(page_content=text, metadata={"source": file.name}))
+    for parsed in parse_pdfs(uploaded_files):
+        documents.extend(chunk_parsed_document(parsed))
+    return documents
+
+def _chunk_ids(documents):
+    ids = [doc.metadata.get("chunk_id") for doc in documents]
+    return None if None in ids else ids
+
+def _embedding_name(embedding):
+    return getattr(embedding, "model_name", type(embedding).__name__)
+
+def vector_cache_key(documents, embedding):
+    """
+    Build the cache key for a set of document chunks
+    
+    Args:
+        documents: List of document chunks
+        embedding: Embedding model
+        
+    Returns:
+        str: Hex digest of chunk IDs, chunking parameters, model name and index kind
+    """
+    digest = hashlib.sha256()
+    ids = _chunk_ids(documents)
+    if ids is None:
+        # Chunks that did not come from process_pdfs: key on their content
+        for doc in documents:
+            digest.update(doc.page_content.encode("utf-8"))
+    else:
+        # Chunk IDs name the file and the chunk, so a subset of the chunks of
+        # the same files gets its own entry
+        digest.update("\n".join(sorted(ids)).encode("utf-8"))
+    digest.update(f"{CHUNK_FORMAT_VERSION}:{CHUNK_SIZE}:{CHUNK_OVERLAP}:{_embedding_name(embedding)}".encode("utf-8"))
+    kind = choose_index_kind(len(documents))
+    if kind != "flat":
+        digest.update(f":{kind}".encode("utf-8"))
+    return digest.hexdigest()
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def evict_vector_cache(cache_dir=VECTOR_CACHE_DIR, max_mb=VECTOR_CACHE_MAX_MB, keep=None):
+    """
+    Remove least recently used cache entries until the cache fits its size limit
     
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    return splitter.split_documents(documents)
+    Args:
+        cache_dir: Cache directory
+        max_mb: Size limit in megabytes
+        keep: Entry name that must not be evicted
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and not name.startswith("."):
+            entries.append((os.path.getmtime(path), name, path, _dir_size(path)))
+    total = sum(entry[3] for entry in entries)
+    for _, name, path, size in sorted(entries):
+        if total <= max_mb * 1024 * 1024:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
 
-def create_vector_store(documents, embedding):
+@traced("embed")
+def create_vector_store(documents, embedding, cache_dir=VECTOR_CACHE_DIR):
     """
     Create FAISS vector store from documents
     
+    Indexes are cached on disk, so re-opening the same papers loads the saved
+    index instead of re-embedding every chunk. Large corpora get a compressed
+    approximate index (see vector_index.choose_index_kind).
+    
     Args:
         documents: List of document chunks
         embedding: Embedding model
+        cache_dir: Cache directory (None disables the cache)
         
     Returns:
         FAISS: Vector store
     """
-    return FAISS.from_documents(documents, embedding)
\ No newline at end of file
+    ids = _chunk_ids(documents)
+    kind = choose_index_kind(len(documents))
+    annotate(chunks=len(documents), model=_embedding_name(embedding), index=kind, cache_hit=False)
+    if not cache_dir:
+        return from_documents(documents, embedding, ids=ids, kind=kind)
+    
+    key = vector_cache_key(documents, embedding)
+    path = os.path.join(cache_dir, key)
+    if os.path.isdir(path):
+        try:
+            vectorstore = FAISS.load_local(path, embedding, allow_dangerous_deserialization=True)
+            set_search_effort(vectorstore.index)
+            os.utime(path)  # mark as recently used
+            annotate(cache_hit=True)
+            return vectorstore
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+    
+    vectorstore = from_documents(documents, embedding, ids=ids, kind=kind)
+    
+    # Write to a temporary directory first so readers never see a partial entry
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+    try:
+        vectorstore.save_local(tmp_path)
+        with open(os.path.join(tmp_path, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "embedding_model": _embedding_name(embedding),
+                "chunk_size": CHUNK_SIZE,
+                "chunk_overlap": CHUNK_OVERLAP,
+                "index": kind,
+                "created_at": time.time(),
+                "metadata": [doc.metadata for doc in documents],
+            }, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    
+    evict_vector_cache(cache_dir, keep=key)
+    return vectorstore
+
+def create_lexical_index(documents):
+    """
+    Create the BM25 inverted index kept next to the FAISS store
+    
+    Args:
+        documents: List of document chunks
+        
+    Returns:
+        LexicalIndex: Lexical index
+    """
+    return LexicalIndex(documents)
+
+def update_corpus(uploaded_files, embedding, vectorstore=None, documents=None, indexed_files=None, lexical_index=None):
+    """
+    Bring the chunk list and vector store in line with the uploaded files
+    
+    Only files that were not indexed before are extracted and embedded;
+    vectors of files that are no longer uploaded are deleted by ID, so the
+    cost depends on what changed rather than on the size of the corpus.
+    
+    Page and chunk text is kept once, in a memory-mapped ChunkStore shared by
+    the returned chunk list, the vector store's docstore, the lexical index
+    and the parsed documents of indexed_files.
+    
+    Args:
+        uploaded_files: List of uploaded PDF files
+        embedding: Embedding model
+        vectorstore: Existing FAISS vector store (optional)
+        documents: Existing ChunkList returned by a previous call (optional)
+        indexed_files: Dict of file hash -> {"name", "chunk_ids", "parsed"} for indexed files
+        lexical_index: Existing LexicalIndex over the chunks (optional)
+        
+    Returns:
+        tuple: (documents as a ChunkList, vectorstore, indexed_files, lexical_index,
+            extraction statistics of the new files or None when none were parsed)
+    """
+    indexed_files = dict(indexed_files or {})
+    store = getattr(documents, "store", None)
+    if vectorstore is None or lexical_index is None or store is None:
+        vectorstore = None
+        indexed_files = {}
+        store = ChunkStore()
+        lexical_index = LexicalIndex(store=store)
+    
+    current = {}
+    for file in uploaded_files:
+        current.setdefault(file_fingerprint(file), file)
+    
+    # Remove files that are no longer part of the upload
+    removed = [file_hash for file_hash in indexed_files if file_hash not in current]
+    if removed:
+        removed_ids = []
+        for file_hash in removed:
+            removed_ids.extend(indexed_files.pop(file_hash)["chunk_ids"])
+        if any(entry["chunk_ids"] for entry in indexed_files.values()):
+            remove_vectors(vectorstore, removed_ids)
+            lexical_index.remove(removed_ids)
+        else:
+            vectorstore = None
+            store = ChunkStore()
+            lexical_index = LexicalIndex(store=store)
+    
+    # Parse and embed only the new files
+    new_files = [(file_hash, file) for file_hash, file in current.items() if file_hash not in indexed_files]
+    new_chunks = []
+    parsed_documents, extraction_stats = _parse_files(new_files) if new_files else ([], None)
+    for parsed in parsed_documents:
+        chunks = chunk_parsed_document(parsed)
+        store.add_file(parsed["file_hash"], parsed["pages"], chunks)
+        # The page text is read back from the store, not kept in the session
+        parsed["pages"] = store.file_pages(parsed["file_hash"])
+        indexed_files[parsed["file_hash"]] = {
+            "name": parsed["name"],
+            "chunk_ids": [doc.metadata["chunk_id"] for doc in chunks],
+            "parsed": parsed,
+        }
+        new_chunks.extend(chunks)
+    
+    if new_chunks:
+        if vectorstore is None:
+            vectorstore = attach_chunk_store(create_vector_store(new_chunks, embedding), store)
+        else:
+            with span("embed", chunks=len(new_chunks), model=_embedding_name(embedding), cache_hit=False):
+                vectorstore.add_documents(new_chunks, ids=_chunk_ids(new_chunks))
+                fit_index(vectorstore)
+        with span("lexical_index", chunks=len(new_chunks)):
+            lexical_index.add(new_chunks)
+    
+    return store.chunks(), vectorstore, indexed_files, lexical_index, extraction_stats
+
+def get_parsed_documents(indexed_files):
+    """
+    Get the parsed documents of all indexed files
+    
+    Args:
+        indexed_files: Dict returned by update_corpus
+        
+    Returns:
+        list: List of parsed documents (see parse_pdfs)
+    """
+    return [entry["parsed"] for entry in indexed_files.values()]
\ No newline at end of file
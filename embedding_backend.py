@@ -0,0 +1,237 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Persistent per-chunk embedding cache, shared by every corpus and session
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+# Model runtime on CPU: torch, int8 (dynamically quantized torch) or onnx
+EMBEDDING_RUNTIME = os.getenv("EMBEDDING_RUNTIME", "torch")
+# Batches are sized so that (texts x longest text) stays within this many tokens,
+# since every text of a batch is padded to the longest one
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+EMBEDDING_MAX_BATCH = 128
+EMBEDDING_RUNTIMES = ("torch", "int8", "onnx")
+
+# Rough characters per token, used only to size batches
+_CHARS_PER_TOKEN = 4
+_LOOKUP_BATCH = 500
+
+def text_hash(text):
+    """SHA-256 hex digest of a chunk text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """SQLite-backed embedding store keyed by model and text hash, with LRU eviction"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB,
+                accessed_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed_at)")
+        self._conn.commit()
+        self.evictions = 0
+
+    def lookup(self, keys):
+        """Return a dict of key -> float32 vector for the keys that are cached"""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET accessed_at = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [now, *(key for key, _ in rows)],
+                    )
+            self._conn.commit()
+        return found
+
+    def update(self, items):
+        """Store (key, vector) pairs, evicting the least recently used ones past max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every cached embedding"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"entries": entries, "evictions": self.evictions}
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    Sentence-transformers model on CPU, with an optional faster runtime
+
+    "torch" matches HuggingFaceEmbeddings with default settings. "int8"
+    applies PyTorch dynamic quantization to the linear layers. "onnx" runs
+    the model with ONNX Runtime (needs sentence-transformers>=3.2 and
+    optimum[onnxruntime]).
+    """
+
+    def __init__(self, model_name, runtime=EMBEDDING_RUNTIME):
+        if runtime not in EMBEDDING_RUNTIMES:
+            raise ValueError(f"Unknown EMBEDDING_RUNTIME {runtime!r}, expected one of {', '.join(EMBEDDING_RUNTIMES)}")
+        from sentence_transformers import SentenceTransformer
+
+        if runtime == "onnx":
+            try:
+                model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+            except (ImportError, TypeError) as e:
+                raise ImportError(
+                    "EMBEDDING_RUNTIME=onnx needs sentence-transformers>=3.2 and optimum[onnxruntime]"
+                ) from e
+        else:
+            model = SentenceTransformer(model_name, device="cpu")
+            if runtime == "int8":
+                import torch
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.runtime = runtime
+        # Vectors of the faster runtimes differ slightly, so they are cached apart
+        self.model_name = model_name if runtime == "torch" else f"{model_name}:{runtime}"
+        self.max_tokens = model.max_seq_length
+
+    def embed_documents(self, texts):
+        # Same preprocessing as HuggingFaceEmbeddings, so indexes built with it stay valid
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = self.model.encode(texts, batch_size=max(len(texts), 1), convert_to_numpy=True, show_progress_bar=False)
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def _model_name(embeddings):
+    return getattr(embeddings, "model_name", None) or f"{type(embeddings).__name__}-{getattr(embeddings, 'size', '')}"
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding model wrapper that skips work it has already done
+
+    Exact duplicate texts (boilerplate repeated across papers) are embedded
+    once per call, and every vector is kept in the persistent EmbeddingCache,
+    so re-uploaded or overlapping papers only embed new chunks. The rest is
+    sorted by length and encoded in batches sized by EMBEDDING_BATCH_TOKENS,
+    which keeps padding low for short texts and memory bounded for long ones.
+    """
+
+    def __init__(self, embeddings, cache=None, batch_tokens=EMBEDDING_BATCH_TOKENS, max_batch=EMBEDDING_MAX_BATCH):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_tokens = batch_tokens
+        self.max_batch = max_batch
+        self.model_name = _model_name(embeddings)
+        self.stats = {"texts": 0, "duplicates": 0, "hits": 0, "encoded": 0, "batches": 0, "encode_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def _tokens(self, text):
+        return min(len(text) // _CHARS_PER_TOKEN + 2, getattr(self.embeddings, "max_tokens", 512))
+
+    def batches(self, texts):
+        """
+        Group texts into batches of similar length within the token budget
+
+        Args:
+            texts: List of texts
+
+        Returns:
+            list: Lists of indices into texts, longest texts first
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = []
+        batch = []
+        for i in order:
+            # Sorted longest first, so the first text sets the padded length
+            longest = self._tokens(texts[batch[0]]) if batch else self._tokens(texts[i])
+            if batch and (len(batch) >= self.max_batch or (len(batch) + 1) * longest > self.batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _encode(self, texts):
+        vectors = [None] * len(texts)
+        for batch in self.batches(texts):
+            start = time.perf_counter()
+            encoded = self.embeddings.embed_documents([texts[i] for i in batch])
+            with self._lock:
+                self.stats["batches"] += 1
+                self.stats["encode_seconds"] += time.perf_counter() - start
+            for i, vector in zip(batch, encoded):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+        return vectors
+
+    def embed_documents(self, texts):
+        """
+        Embed texts, reusing cached vectors and embedding duplicates once
+
+        Args:
+            texts: List of texts
+
+        Returns:
+            list: One vector (list of floats) per text
+        """
+        keys = [f"{self.model_name}:{text_hash(text)}" for text in texts]
+        unique = {}
+        for i, key in enumerate(keys):
+            unique.setdefault(key, i)
+        found = self.cache.lookup(list(unique)) if self.cache is not None else {}
+
+        missing = [key for key in unique if key not in found]
+        if missing:
+            encoded = self._encode([texts[unique[key]] for key in missing])
+            found.update(zip(missing, encoded))
+            if self.cache is not None:
+                self.cache.update(zip(missing, encoded))
+
+        with self._lock:
+            self.stats["texts"] += len(texts)
+            self.stats["duplicates"] += len(texts) - len(unique)
+            self.stats["hits"] += len(unique) - len(missing)
+            self.stats["encoded"] += len(missing)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        # Questions are not written to the per-chunk cache, where they would
+        # push out chunk vectors; ChatSession caches them per session
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,106 @@
+import hashlib
+import random
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from llm_scheduler import TokenBucket
+
+_WORDS = (
+    "the paper proposes a method evaluates results shows improvement over baselines "
+    "limitations include dataset size future work could extend analysis to new domains"
+).split()
+
+class FakeRateLimitError(Exception):
+    """Simulated HTTP 429 from the fake backend"""
+
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("Rate limit reached (simulated 429)")
+        self.retry_after = retry_after
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for offline tests and benchmarks
+
+    The reply depends only on the prompt, latency is simulated with a fixed
+    time to first token plus a per-token delay, and the model raises
+    FakeRateLimitError when its own requests-per-minute limit is exceeded
+    or, with error_rate, at random (seeded) requests.
+    """
+
+    model_name: str = "fake-llm"
+    response_tokens: int = 40
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    requests_per_minute: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+    state: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.state = {
+            "lock": threading.Lock(),
+            "random": random.Random(self.seed),
+            "bucket": TokenBucket(self.requests_per_minute) if self.requests_per_minute else None,
+            "calls": 0,
+            "rate_limited": 0,
+        }
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name, "response_tokens": self.response_tokens}
+
+    def _admit(self):
+        with self.state["lock"]:
+            self.state["calls"] += 1
+            bucket = self.state["bucket"]
+            limited = self.error_rate and self.state["random"].random() < self.error_rate
+            if bucket is not None:
+                wait = bucket.wait_time(1)
+                if wait > 0:
+                    limited = True
+                else:
+                    bucket.consume(1)
+            if limited:
+                self.state["rate_limited"] += 1
+                raise FakeRateLimitError(retry_after=bucket.wait_time(1) if bucket is not None else None)
+
+    def _reply_tokens(self, messages):
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        rng = random.Random(digest)
+        return [f"[{self.model_name}:{digest.hex()[:8]}]"] + [
+            " " + rng.choice(_WORDS) for _ in range(self.response_tokens - 1)
+        ]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._admit()
+        tokens = self._reply_tokens(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(tokens))
+        message = AIMessage(
+            content="".join(tokens),
+            usage_metadata={
+                "input_tokens": sum(len(str(m.content).split()) for m in messages),
+                "output_tokens": len(tokens),
+                "total_tokens": sum(len(str(m.content).split()) for m in messages) + len(tokens),
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._admit()
+        time.sleep(self.first_token_latency)
+        for token in self._reply_tokens(messages):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
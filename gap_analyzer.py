@@ -1,7 +1,6 @@
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import LLMChain
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from summarizer import get_summary_prompt
+from artifact_pipeline import get_artifact, get_cached_artifact, store_artifact, fingerprint_documents, artifact_text
 
 def get_gap_prompt():
     """Get the prompt template for research gap analysis"""
@@ -14,6 +13,8 @@ def identify_research_gaps(llm, documents):
     """
     Identify research gaps in the document
     
+    Reuses the cached summary of the document set when available.
+    
     Args:
         llm: Language model instance
         documents: List of document chunks
@@ -21,12 +22,29 @@ def identify_research_gaps(llm, documents):
     Returns:
         str: Research gaps analysis
     """
-    # First get summary
-    summary_prompt = get_summary_prompt()
-    chain1 = create_stuff_documents_chain(llm, summary_prompt)
-    summary = chain1.invoke({"context": documents})
+    return get_artifact("gaps", llm, documents)
+
+def identify_research_gaps_stream(llm, documents):
+    """
+    Identify research gaps in the document, yielding tokens as they arrive
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        
+    Yields:
+        str: Research gaps tokens
+    """
+    fingerprint = fingerprint_documents(documents, llm)
+    cached = get_cached_artifact("gaps", fingerprint)
+    if cached is not None:
+        yield artifact_text(cached)
+        return
     
-    # Then analyze gaps
-    gap_prompt = get_gap_prompt()
-    chain2 = LLMChain(llm=llm, prompt=gap_prompt)
-    return chain2.invoke({"summary": summary})
\ No newline at end of file
+    summary = get_artifact("summary", llm, documents, fingerprint)
+    chain = get_gap_prompt() | llm | StrOutputParser()
+    parts = []
+    for token in chain.stream({"summary": summary}):
+        parts.append(token)
+        yield token
+    store_artifact("gaps", fingerprint, {"summary": summary, "text": "".join(parts)})
\ No newline at end of file
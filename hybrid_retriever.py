@@ -0,0 +1,198 @@
+import re
+import numpy as np
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Reciprocal rank fusion constant
+RRF_K = 60
+
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+def tokenize(text):
+    """Split text into lowercase terms, keeping names like 'ImageNet-1k' or 'v2.1' intact"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class LexicalIndex:
+    """
+    BM25 inverted index over document chunks
+
+    Postings are kept per term; BM25 weights are precomputed into numpy
+    arrays so a query is a handful of vectorized scatter-adds. With a
+    ChunkStore, only chunk rows are kept and results are materialized from
+    the store.
+    """
+
+    def __init__(self, documents=None, store=None):
+        self.store = store
+        self.documents = []  # Documents, or rows of the chunk store
+        self.chunk_ids = []
+        self.lengths = []
+        self.postings = {}  # term -> {doc index: term frequency}
+        self._positions = {}  # chunk_id -> doc index
+        self._removed = set()
+        self._weights = None
+        if documents:
+            self.add(documents)
+
+    def __len__(self):
+        return len(self.documents) - len(self._removed)
+
+    def add(self, documents):
+        """Index new document chunks"""
+        for doc in documents:
+            index = len(self.documents)
+            chunk_id = doc.metadata.get("chunk_id", str(index))
+            terms = tokenize(doc.page_content)
+            self.documents.append(doc if self.store is None else self.store.row(chunk_id))
+            self.chunk_ids.append(chunk_id)
+            self.lengths.append(len(terms))
+            self._positions[chunk_id] = index
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[index] = count
+        self._weights = None
+
+    def remove(self, chunk_ids):
+        """Remove document chunks by chunk_id"""
+        for chunk_id in chunk_ids:
+            index = self._positions.pop(chunk_id, None)
+            if index is not None:
+                self._removed.add(index)
+        self._weights = None
+
+    def _build_weights(self):
+        lengths = np.array(self.lengths, dtype=np.float32)
+        live = np.ones(len(self.documents), dtype=bool)
+        live[list(self._removed)] = False
+        count = max(int(live.sum()), 1)
+        avg_length = float(lengths[live].mean()) if live.any() else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avg_length, 1.0))
+
+        weights = {}
+        for term, posting in self.postings.items():
+            indices = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            tf = np.fromiter(posting.values(), dtype=np.float32, count=len(posting))
+            keep = live[indices]
+            if not keep.any():
+                continue
+            indices, tf = indices[keep], tf[keep]
+            idf = np.log(1 + (count - len(indices) + 0.5) / (len(indices) + 0.5))
+            weights[term] = (indices, idf * tf * (BM25_K1 + 1) / (tf + norm[indices]))
+        self._weights = weights
+
+    def search(self, query, k=20):
+        """
+        Rank chunks for a query with BM25
+
+        Args:
+            query: Query text
+            k: Number of results
+
+        Returns:
+            list: List of (document, score) pairs, best first
+        """
+        if self._weights is None:
+            self._build_weights()
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self._weights:
+                indices, weights = self._weights[term]
+                scores[indices] += weights
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        if self.store is not None:
+            return [(self.store.document(self.documents[i]), float(scores[i])) for i in matched]
+        return [(self.documents[i], float(scores[i])) for i in matched]
+
+def _chunk_key(doc):
+    return doc.metadata.get("chunk_id") or doc.page_content
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuse several ranked document lists with reciprocal rank fusion
+
+    Args:
+        rankings: List of ranked document lists
+        k: RRF constant
+
+    Returns:
+        list: Fused list of documents, best first
+    """
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = _chunk_key(doc)
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+def load_cross_encoder(model_name=CROSS_ENCODER_MODEL):
+    """
+    Load a local CPU cross-encoder for reranking, if sentence-transformers is installed
+
+    Args:
+        model_name: Cross-encoder model name
+
+    Returns:
+        CrossEncoder or None: Reranker model
+    """
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        return None
+    return CrossEncoder(model_name, device="cpu")
+
+def rerank(query, documents, reranker, k):
+    """
+    Reorder candidate chunks with a cross-encoder
+
+    Args:
+        query: Query text
+        documents: Candidate document chunks
+        reranker: Cross-encoder model
+        k: Number of results
+
+    Returns:
+        list: Top-k document chunks
+    """
+    if not documents:
+        return documents
+    scores = reranker.predict([(query, doc.page_content) for doc in documents])
+    order = np.argsort(-np.asarray(scores))
+    return [documents[i] for i in order[:k]]
+
+def hybrid_search(query, vectorstore, lexical_index, k=4, candidates=20, query_vector=None, reranker=None):
+    """
+    Retrieve chunks by fusing dense FAISS similarity with BM25
+
+    Args:
+        query: Query text
+        vectorstore: FAISS vector store
+        lexical_index: LexicalIndex over the same chunks
+        k: Number of results
+        candidates: Number of candidates taken from each retriever
+        query_vector: Precomputed query embedding (optional)
+        reranker: Cross-encoder used to rerank the fused candidates (optional)
+
+    Returns:
+        list: List of document chunks
+    """
+    if query_vector is None:
+        dense = vectorstore.similarity_search(query, k=candidates)
+    else:
+        dense = vectorstore.similarity_search_by_vector(query_vector, k=candidates)
+    lexical = [doc for doc, _ in lexical_index.search(query, candidates)]
+    fused = reciprocal_rank_fusion([dense, lexical])
+    if reranker is not None:
+        return rerank(query, fused[:candidates], reranker, k)
+    return fused[:k]
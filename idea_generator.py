@@ -1,8 +1,7 @@
-from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import LLMChain
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from summarizer import get_summary_prompt
-from gap_analyzer import get_gap_prompt
+from artifact_pipeline import get_artifact, artifact_text
 
 def get_idea_prompt():
     """Get the prompt template for research idea generation"""
@@ -23,17 +22,25 @@ def suggest_research_ideas(llm, documents):
     Returns:
         str: Research ideas suggestions
     """
-    # First get summary
-    summary_prompt = get_summary_prompt()
-    chain1 = create_stuff_documents_chain(llm, summary_prompt)
-    summary = chain1.invoke({"context": documents})
+    # Summary and gaps come from the shared artifact cache
+    gaps = get_artifact("gaps", llm, documents)
     
-    # Then identify gaps
-    gap_prompt = get_gap_prompt()
-    chain2 = LLMChain(llm=llm, prompt=gap_prompt)
-    gaps = chain2.invoke({"summary": summary})
-    
-    # Finally suggest ideas
+    # Suggest ideas
     idea_prompt = get_idea_prompt()
-    chain3 = LLMChain(llm=llm, prompt=idea_prompt)
-    return chain3.invoke({"gaps": gaps})
\ No newline at end of file
+    chain = LLMChain(llm=llm, prompt=idea_prompt)
+    return chain.invoke({"gaps": artifact_text(gaps)})
+
+def suggest_research_ideas_stream(llm, documents):
+    """
+    Suggest research ideas based on identified gaps, yielding tokens as they arrive
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        
+    Yields:
+        str: Research ideas tokens
+    """
+    gaps = get_artifact("gaps", llm, documents)
+    chain = get_idea_prompt() | llm | StrOutputParser()
+    yield from chain.stream({"gaps": artifact_text(gaps)})
\ No newline at end of file
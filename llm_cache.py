@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from tracing import span, leaf_span, record_llm_call
+
+# Persistent response cache shared by every chain built on the wrapped model
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
+
+class ResponseCache:
+    """SQLite-backed LLM response store with LRU and TTL eviction"""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                value TEXT,
+                created_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """Return the cached response for key, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def update(self, key, model, value):
+        """Store a response, evicting the least recently used ones past max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, value, now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss statistics"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+def prompt_fingerprint(model_params, messages, stop=None, **kwargs):
+    """
+    Fingerprint a request by model, rendered prompt and generation parameters
+
+    Args:
+        model_params: Identifying parameters of the model (name, temperature, ...)
+        messages: Rendered prompt messages
+        stop: Stop sequences
+        **kwargs: Extra generation parameters
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    payload = {
+        "model": model_params,
+        "messages": [(message.type, message.content) for message in messages],
+        "stop": stop,
+        "kwargs": kwargs,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class CachedChatModel(BaseChatModel):
+    """Chat model wrapper that serves repeated requests from a ResponseCache"""
+
+    llm: BaseChatModel
+    response_cache: Any
+
+    @property
+    def _llm_type(self):
+        return f"cached-{self.llm._llm_type}"
+
+    @property
+    def _identifying_params(self):
+        return self.llm._identifying_params
+
+    def _model_name(self):
+        params = self.llm._identifying_params
+        return str(params.get("model_name") or params.get("model") or self.llm._llm_type)
+
+    def _key(self, messages, stop, kwargs):
+        return prompt_fingerprint(
+            {"type": self.llm._llm_type, **self.llm._identifying_params}, messages, stop, **kwargs
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._key(messages, stop, kwargs)
+        with span("llm", stream=False) as current:
+            cached = self.response_cache.lookup(key)
+            if cached is not None:
+                record_llm_call(current, messages, cached, cache_hit=True, model=self._model_name())
+                return ChatResult(generations=[ChatGeneration(message=AIMessage(content=cached))])
+
+            result = self.llm._generate(messages, stop=stop, **kwargs)
+            message = result.generations[0].message
+            record_llm_call(current, messages, message.content, getattr(message, "usage_metadata", None),
+                            model=self._model_name())
+            self.response_cache.update(key, self._model_name(), message.content)
+            return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._key(messages, stop, kwargs)
+        with leaf_span("llm", stream=True) as current:
+            cached = self.response_cache.lookup(key)
+            if cached is not None:
+                record_llm_call(current, messages, cached, cache_hit=True, model=self._model_name())
+                yield ChatGenerationChunk(message=AIMessageChunk(content=cached))
+                return
+
+            parts = []
+            usage = None
+            for chunk in self.llm._stream(messages, stop=stop, **kwargs):
+                if not parts:
+                    current.set(first_token_ms=round(current.duration_ms, 1))
+                parts.append(chunk.message.content)
+                usage = getattr(chunk.message, "usage_metadata", None) or usage
+                yield chunk
+            record_llm_call(current, messages, "".join(parts), usage, model=self._model_name())
+            # Only complete responses are cached
+            self.response_cache.update(key, self._model_name(), "".join(parts))
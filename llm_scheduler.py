@@ -0,0 +1,239 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from context_packer import count_tokens
+
+# Request priorities, lower runs first
+INTERACTIVE = 0
+NORMAL = 5
+BATCH = 10
+
+# Groq limits for the shared API key
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+
+# Completion tokens assumed when a request does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount can be consumed (0 if it can be now)"""
+        self._refill()
+        # Requests larger than the bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+def is_rate_limit_error(error):
+    """Whether an exception is an HTTP 429 / rate-limit error from the LLM provider"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text.replace(" ", "").replace("_", "") or "429" in text
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = getattr(error, "retry_after", None) or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class LLMScheduler:
+    """
+    Shared scheduler for every LLM call
+
+    Calls wait for a concurrency slot and for capacity in the requests- and
+    tokens-per-minute buckets, highest priority first. Rate-limit errors are
+    retried with jittered exponential backoff, and a Retry-After hint pauses
+    the whole queue.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES, base_delay=1.0, max_delay=30.0,
+                 clock=time.monotonic, sleep=time.sleep, seed=None):
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._random = random.Random(seed)
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._counter = itertools.count()
+        self._active = 0
+        # Set after a 429 so that every queued call backs off, not only the failed one
+        self._paused_until = 0.0
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failed": 0, "queue_seconds": 0.0}
+
+    def acquire(self, priority=NORMAL, tokens=0):
+        """Block until the call may start; must be paired with release()"""
+        entry = (priority, next(self._counter))
+        start = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            while True:
+                timeout = None
+                if self._waiting[0] == entry and self._active < self.max_concurrency:
+                    timeout = max(
+                        self.request_bucket.wait_time(1),
+                        self.token_bucket.wait_time(tokens),
+                        self._paused_until - time.monotonic(),
+                    )
+                    if timeout <= 0:
+                        break
+                self._condition.wait(timeout)
+            heapq.heappop(self._waiting)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(tokens)
+            self._active += 1
+            self.stats["calls"] += 1
+            self.stats["queue_seconds"] += time.monotonic() - start
+            self._condition.notify_all()
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def backoff(self, attempt, error=None):
+        """Delay before retry number attempt (full jitter, honouring Retry-After)"""
+        delay = self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error) if error is not None else None
+        return max(delay, retry_after or 0.0)
+
+    def _handle_error(self, error, attempt):
+        if not is_rate_limit_error(error) or attempt >= self.max_retries:
+            with self._condition:
+                self.stats["failed"] += 1
+            raise error
+        delay = self.backoff(attempt, error)
+        with self._condition:
+            self.stats["rate_limited"] += 1
+            self.stats["retries"] += 1
+            retry_after = _retry_after(error)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self.sleep(delay)
+
+    def call(self, fn, priority=NORMAL, tokens=0):
+        """
+        Run fn() under the scheduler, retrying rate-limit errors
+
+        Args:
+            fn: Function performing the LLM request
+            priority: Request priority (INTERACTIVE, NORMAL or BATCH)
+            tokens: Estimated prompt + completion tokens
+
+        Returns:
+            The return value of fn
+        """
+        for attempt in itertools.count():
+            self.acquire(priority, tokens)
+            try:
+                return fn()
+            except Exception as e:
+                error = e
+            finally:
+                self.release()
+            self._handle_error(error, attempt)
+
+    def stream(self, fn, priority=NORMAL, tokens=0):
+        """
+        Iterate over fn() under the scheduler
+
+        Rate-limit errors are retried as long as no chunk has been yielded;
+        the concurrency slot is held until the stream is exhausted.
+
+        Args:
+            fn: Function returning an iterator of chunks
+            priority: Request priority (INTERACTIVE, NORMAL or BATCH)
+            tokens: Estimated prompt + completion tokens
+
+        Yields:
+            Chunks produced by fn()
+        """
+        for attempt in itertools.count():
+            started = False
+            self.acquire(priority, tokens)
+            try:
+                for chunk in fn():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                self.release()
+            self._handle_error(error, attempt)
+
+def estimate_tokens(messages, **kwargs):
+    """Estimate prompt + completion tokens of a chat request"""
+    prompt = sum(count_tokens(str(message.content)) for message in messages)
+    return prompt + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+class ScheduledChatModel(BaseChatModel):
+    """Chat model wrapper that sends every call through an LLMScheduler"""
+
+    llm: BaseChatModel
+    scheduler: Any
+    priority: int = NORMAL
+
+    @property
+    def _llm_type(self):
+        return self.llm._llm_type
+
+    @property
+    def _identifying_params(self):
+        return self.llm._identifying_params
+
+    def with_priority(self, priority):
+        """Return a copy of this model whose calls run at the given priority"""
+        return self.model_copy(update={"priority": priority})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.scheduler.call(
+            lambda: self.llm._generate(messages, stop=stop, **kwargs),
+            self.priority,
+            estimate_tokens(messages, **kwargs),
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield from self.scheduler.stream(
+            lambda: self.llm._stream(messages, stop=stop, **kwargs),
+            self.priority,
+            estimate_tokens(messages, **kwargs),
+        )
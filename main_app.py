@@ -1,43 +1,93 @@
+import time
+_rerun_start = time.perf_counter()
+
+import json
 import streamlit as st
-import os
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_community.embeddings import HuggingFaceEmbeddings
-
-# Import all modules
-from document_processor import process_pdfs, create_vector_store
-from summarizer import summarize_document
-from gap_analyzer import identify_research_gaps
-from idea_generator import suggest_research_ideas
-from debate_simulator import simulate_debate
-from citation_generator import generate_citation
-from chat_handler import chat_with_paper
-from translator import translate_text
+from resources import get_llm, get_embedding, get_reranker, get_response_cache, get_scheduler, PROCESS_START, RESOURCE_TIMINGS
+from tracing import begin_trace, end_trace, annotate, summarize_spans, span_depths, recent_spans, to_jsonl, to_otlp
+
+# Agent modules (and pandas/matplotlib/plotly/pdfplumber behind them) are
+# imported lazily by the task that first needs them, to keep reruns fast.
 
 # Load environment variables
 load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
+
+# Every span opened during this script run (parsing, embedding, retrieval,
+# LLM calls) is recorded under one trace per rerun
+rerun_trace = begin_trace("rerun")
 
 # Streamlit UI setup
 st.set_page_config(page_title="Multi-Agent Research Assistant", layout="wide")
 st.title("🤖 Multi-Agent Research Assistant")
 st.markdown("Enhance your research process with intelligent summarization, critique, debate, translation, citation, and interactive Q&A. Upload a research paper and let our agents do the thinking!")
 
-# Load Groq LLM (Llama3)
-llm = ChatGroq(groq_api_key=groq_api_key, model_name="Llama3-8b-8192")
+# Load Groq LLM (Llama3), shared across sessions and reruns
+llm = get_llm()
 
-# Load embedding model
-embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# Set when a response has already been streamed to the page during this run
+streamed_response = False
 
 # File uploader
 uploaded_files = st.file_uploader("📁 Upload one or more PDF files", type=["pdf"], accept_multiple_files=True)
 
+# Session keys that describe the processed corpus
+CORPUS_KEYS = ["documents", "vectorstore", "indexed_files", "lexical_index", "chat_session"]
+
+if not uploaded_files and "documents" in st.session_state:
+    # Every file was removed from the uploader, so there is nothing to run tasks on
+    for key in CORPUS_KEYS:
+        st.session_state.pop(key, None)
+
 if uploaded_files and st.button("📚 Process Documents"):
+    annotate(task="Process documents")
     with st.spinner("Processing documents and generating vector store..."):
-        documents = process_pdfs(uploaded_files)
-        st.session_state.documents = documents
-        st.session_state.vectorstore = create_vector_store(documents, embedding)
-    st.success("✅ Document vector store created!")
+        from document_processor import update_corpus
+        # Load embedding model, shared across sessions and reruns
+        embedding = get_embedding()
+        # Only new files are parsed and embedded; removed files are dropped from the index
+        documents, vectorstore, indexed_files, lexical_index, extraction_stats = update_corpus(
+            uploaded_files,
+            embedding,
+            st.session_state.get("vectorstore"),
+            st.session_state.get("documents"),
+            st.session_state.get("indexed_files"),
+            st.session_state.get("lexical_index"),
+        )
+        # The corpus changed, so cached retrieval results are stale
+        st.session_state.pop("chat_session", None)
+        if vectorstore is None:
+            # No text in any of the uploaded files
+            for key in CORPUS_KEYS:
+                st.session_state.pop(key, None)
+        else:
+            st.session_state.documents = documents
+            st.session_state.vectorstore = vectorstore
+            st.session_state.indexed_files = indexed_files
+            st.session_state.lexical_index = lexical_index
+    if vectorstore is None:
+        st.warning("⚠️ No text could be extracted from the uploaded files.")
+    else:
+        st.success("✅ Document vector store created!")
+    # Only files parsed in this run have stats; an unchanged or removal-only update has none
+    if extraction_stats and extraction_stats["pages"]:
+        st.caption(
+            f"Extracted {extraction_stats['pages']} pages from {extraction_stats['files']} file(s) "
+            f"in {extraction_stats['seconds']:.2f}s ({extraction_stats['pages_per_second']:.1f} pages/s, "
+            f"{extraction_stats['workers']} workers)"
+        )
+
+# Recall/latency trade-off, shown once the corpus is large enough for an approximate index
+if st.session_state.get("vectorstore") is not None:
+    from vector_index import index_kind, set_search_effort, VECTOR_SEARCH_EFFORT
+    if index_kind(st.session_state.vectorstore.index) != "flat":
+        search_effort = st.sidebar.slider(
+            "🎯 Vector search effort", 0.0, 1.0, VECTOR_SEARCH_EFFORT, 0.05, key="search_effort",
+            help="Higher finds more of the exact nearest chunks, lower answers faster.",
+            # Cached retrieval results were found with the previous setting
+            on_change=lambda: st.session_state.pop("chat_session", None),
+        )
+        set_search_effort(st.session_state.vectorstore.index, search_effort)
 
 # Agent Activation
 if "documents" in st.session_state:
@@ -48,40 +98,156 @@ if "documents" in st.session_state:
         "Suggest research ideas",
         "Simulate a debate",
         "Generate citation",
+        "Generate visual insights",
+        "Full report",
         "Chat with paper"
     ])
 
+    SUMMARY_TASKS = ["Summarize document", "Identify research gaps", "Suggest research ideas", "Simulate a debate", "Full report"]
+    if task in SUMMARY_TASKS:
+        context_mode = st.radio(
+            "Context:",
+            ["Whole paper (map-reduce)", "Packed context (single call)"],
+            horizontal=True,
+            help="Packed context picks the most relevant, non-redundant chunks that fit the model's token budget.",
+        )
+
     # Handle Chat with paper separately
     if task == "Chat with paper":
         query = st.text_input("💬 Ask a question about the paper:")
+        use_reranker = st.checkbox("Rerank results with a local cross-encoder", key="use_reranker",
+                                   on_change=lambda: st.session_state.pop("chat_session", None))
         if query and st.button("🚀 Ask Question"):
-            with st.spinner("Searching paper for answer..."):
-                output = chat_with_paper(llm, st.session_state.vectorstore, query)
-                st.session_state["last_agent_output"] = output
+            annotate(task=task)
+            from chat_handler import ChatSession
+            from llm_scheduler import INTERACTIVE
+            # One session per processed corpus keeps the chain, memory and caches
+            if "chat_session" not in st.session_state:
+                # Chat questions are scheduled ahead of longer agent runs
+                st.session_state.chat_session = ChatSession(
+                    get_llm(priority=INTERACTIVE),
+                    st.session_state.vectorstore,
+                    lexical_index=st.session_state.lexical_index,
+                    reranker=get_reranker() if use_reranker else None,
+                )
+            chat_session = st.session_state.chat_session
+            st.markdown("### 🤖 Agent Response")
+            output = st.write_stream(chat_session.ask_stream(query))
+            st.session_state["last_agent_output"] = output
+            streamed_response = True
+            timings = chat_session.last_timings
+            st.caption(
+                f"embed {timings['embed'] * 1000:.0f} ms · search {timings['search'] * 1000:.0f} ms · "
+                f"generate {timings['generate'] * 1000:.0f} ms"
+            )
     
     # Handle other tasks
     elif st.button("🚀 Run Agent"):
-        with st.spinner("Running agents..."):
-            docs = st.session_state.documents[:10]
-            output = ""
+        annotate(task=task)
+        from context_packer import pack_context
+        docs = st.session_state.documents
+        vectorstore = st.session_state.vectorstore
+        output = ""
+        stream = None
+        context_report = None
+
+        # Summary-based agents either cover the whole paper (map-reduce when it
+        # does not fit the context window) or one call over the packed chunks
+        if task in SUMMARY_TASKS and context_mode == "Packed context (single call)":
+            from summarizer import get_summary_prompt
+            docs, context_report = pack_context(docs, get_summary_prompt(), vectorstore)
+
+        if task == "Summarize document":
+            from summarizer import summarize_document_stream
+            stream = summarize_document_stream(llm, docs)
+
+        elif task == "Identify research gaps":
+            from gap_analyzer import identify_research_gaps_stream
+            stream = identify_research_gaps_stream(llm, docs)
+
+        elif task == "Suggest research ideas":
+            from idea_generator import suggest_research_ideas_stream
+            stream = suggest_research_ideas_stream(llm, docs)
+
+        elif task == "Simulate a debate":
+            from debate_simulator import simulate_debate_stream
+            stream = simulate_debate_stream(llm, docs)
+
+        elif task == "Generate citation":
+            from citation_generator import generate_citation_stream
+            from citation_generator import get_citation_prompt
+            # The citation needs the front matter: favour title, author and venue chunks
+            citation_docs, context_report = pack_context(
+                docs, get_citation_prompt(), vectorstore,
+                query="title, authors, affiliations, journal or conference and publication year of the paper",
+                lambda_mult=0.9,
+            )
+            stream = generate_citation_stream(llm, citation_docs)
 
-            if task == "Summarize document":
-                output = summarize_document(llm, docs)
+        elif task == "Generate visual insights":
+            with st.spinner("Extracting data and generating visualizations..."):
+                from artifact_pipeline import artifact_text
+                from document_processor import get_parsed_documents
+                from visualization import generate_visual_insights
+                # Reuses the page text parsed at "Process Documents" time; tables are extracted on first use
+                insights = generate_visual_insights(llm, get_parsed_documents(st.session_state.indexed_files))
+                st.session_state["visual_insights"] = insights
+                output = artifact_text(insights['ai_analysis'])
 
-            elif task == "Identify research gaps":
-                output = identify_research_gaps(llm, docs)
+        elif task == "Full report":
+            from artifact_pipeline import artifact_text
+            from document_processor import get_parsed_documents
+            from report_runner import run_full_report, REPORT_SECTIONS
+            # All agents run concurrently as a dependency graph; each section
+            # is rendered as soon as its agent finishes
+            st.markdown("### 🤖 Full Report")
+            placeholders = {name: st.empty() for name in REPORT_SECTIONS}
+            for name, title in REPORT_SECTIONS.items():
+                placeholders[name].info(f"⏳ {title}: running...")
 
-            elif task == "Suggest research ideas":
-                output = suggest_research_ideas(llm, docs)
+            def show_section(name, value, error, seconds):
+                with placeholders[name].container():
+                    st.markdown(f"#### {REPORT_SECTIONS[name]}")
+                    if error is not None:
+                        st.error(f"Failed: {error}")
+                    elif name == "visual_insights":
+                        st.session_state["visual_insights"] = value
+                        st.write(artifact_text(value['ai_analysis']))
+                    else:
+                        st.write(value)
+                    st.caption(f"{seconds:.1f}s")
 
-            elif task == "Simulate a debate":
-                output = simulate_debate(llm, docs)
+            with st.spinner("Running all agents..."):
+                report_start = time.perf_counter()
+                from llm_scheduler import BATCH
+                results = run_full_report(
+                    get_llm(priority=BATCH), docs, get_parsed_documents(st.session_state.indexed_files), vectorstore, show_section
+                )
+            st.caption(f"Full report finished in {time.perf_counter() - report_start:.1f}s")
+            sections = []
+            for name, title in REPORT_SECTIONS.items():
+                value = results[name]["value"]
+                if name == "visual_insights" and value is not None:
+                    value = artifact_text(value['ai_analysis'])
+                if value is not None:
+                    sections.append(f"## {title}\n\n{value}")
+            output = "\n\n".join(sections)
+            streamed_response = True
 
-            elif task == "Generate citation":
-                output = generate_citation(llm, docs)
+        # Render tokens live as they arrive
+        if stream is not None:
+            st.markdown("### 🤖 Agent Response")
+            output = st.write_stream(stream)
+            if context_report:
+                st.caption(
+                    f"Context: {context_report['used']} / {context_report['budget']} tokens "
+                    f"({context_report['utilization']:.0%}), {context_report['chunks']} of "
+                    f"{context_report['candidates']} chunks"
+                )
+            streamed_response = True
 
-            if output:
-                st.session_state["last_agent_output"] = output
+        if output:
+            st.session_state["last_agent_output"] = output
 
 # Final Display Section with Translation Option
 if "last_agent_output" in st.session_state:
@@ -89,7 +255,8 @@ if "last_agent_output" in st.session_state:
 
     translate_toggle = st.toggle("🌍 Translate the response?")
 
-    if not translate_toggle:
+    # A response streamed during this run is already on screen
+    if not translate_toggle and not streamed_response:
         st.markdown("### 🤖 Agent Response")
         st.write(output)
 
@@ -102,6 +269,127 @@ if "last_agent_output" in st.session_state:
             user_language = selected_language
 
         if user_language:
-            translated = translate_text(llm, output, user_language)
+            from translator import translate_text_stream
             st.markdown(f"### 🌐 Translated Response ({user_language})")
-            st.write(translated)
\ No newline at end of file
+            st.write_stream(translate_text_stream(llm, output, user_language))
+
+# Display Visual Insights if available
+if "visual_insights" in st.session_state:
+    from artifact_pipeline import artifact_text
+    insights = st.session_state["visual_insights"]
+
+    st.markdown("### 📊 Visual Insights")
+
+    # Any table can be charted; typed tables are cached, so switching does not parse the PDFs again
+    table_labels = insights.get('table_labels') or []
+    if len(table_labels) > 1:
+        table_index = st.selectbox(
+            "Table to chart:", range(len(table_labels)),
+            index=insights['table_index'] or 0, format_func=table_labels.__getitem__,
+        )
+        if table_index != insights['table_index']:
+            from document_processor import get_parsed_documents
+            from visualization import extract_numerical_data_from_pdf, create_sample_charts
+            extracted = extract_numerical_data_from_pdf(get_parsed_documents(st.session_state.indexed_files))
+            chart, data_summary = create_sample_charts(extracted, table_index)
+            insights.update({'chart': chart, 'data_summary': data_summary, 'table_index': table_index})
+
+    # Display data summary
+    st.markdown("#### Data Extraction Summary")
+    st.info(f"📋 {insights['data_summary']}")
+    st.info(f"📊 Tables found: {insights['tables_found']}")
+
+    if insights['extracted_numbers']:
+        st.info(f"🔢 Sample extracted numbers: {', '.join(insights['extracted_numbers'][:10])}")
+
+    # Display charts; figures are built on first display and cached per chart
+    from chart_renderer import render_plotly, render_matplotlib, downsample_note
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("#### Interactive Chart (Plotly)")
+        st.plotly_chart(render_plotly(insights['chart']), use_container_width=True)
+
+    with col2:
+        st.markdown("#### Static Chart (Matplotlib)")
+        st.image(render_matplotlib(insights['chart']))
+
+    if downsample_note(insights['chart']):
+        st.caption(downsample_note(insights['chart']))
+
+    # Display AI analysis
+    st.markdown("#### 🤖 AI Analysis of Visual Data")
+    st.write(artifact_text(insights['ai_analysis']))
+
+    # Clear button
+    if st.button("🗑️ Clear Visual Insights"):
+        del st.session_state["visual_insights"]
+        st.rerun()
+
+# Startup and rerun timing report
+end_trace(rerun_trace)
+trace_spans = rerun_trace.to_dicts()
+# Keep the last run that did real work, so toggling the panel does not replace it
+if len(trace_spans) > 1:
+    st.session_state["last_trace"] = trace_spans
+# Traces of this session, so exports never include other users' spans
+session_trace_ids = st.session_state.setdefault("trace_ids", [])
+session_trace_ids.append(rerun_trace.trace_id)
+del session_trace_ids[:-50]
+rerun_seconds = time.perf_counter() - _rerun_start
+run_timings = st.session_state.setdefault("run_timings", [])
+run_timings.append(rerun_seconds)
+del run_timings[:-50]
+with st.sidebar.expander("⏱️ Performance"):
+    if len(run_timings) == 1:
+        st.caption(f"Startup: {time.perf_counter() - PROCESS_START:.2f}s since process start")
+    st.caption(f"This run: {rerun_seconds * 1000:.0f} ms")
+    if len(run_timings) > 1:
+        reruns = sorted(run_timings[1:])
+        st.caption(f"Reruns: {len(reruns)}, median {reruns[len(reruns) // 2] * 1000:.0f} ms")
+    for name, seconds in RESOURCE_TIMINGS.items():
+        st.caption(f"Loaded {name} in {seconds:.2f}s (once per process)")
+    cache_stats = get_response_cache().stats()
+    scheduler_stats = get_scheduler().stats
+    st.caption(
+        f"LLM scheduler: {scheduler_stats['calls']} calls, {scheduler_stats['retries']} retries, "
+        f"{scheduler_stats['queue_seconds']:.1f}s queued"
+    )
+    st.caption(
+        f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries"
+    )
+    if any(name.startswith("embedding:") for name in RESOURCE_TIMINGS):
+        embedding_stats = get_embedding().stats
+        st.caption(
+            f"Embeddings: {embedding_stats['encoded']} encoded in {embedding_stats['batches']} batches, "
+            f"{embedding_stats['hits']} cached, {embedding_stats['duplicates']} duplicates skipped"
+        )
+
+# Optional per-span breakdown of the last run that did real work
+if st.sidebar.checkbox("🔍 Debug panel", key="debug_panel"):
+    with st.sidebar.expander("🔍 Trace", expanded=True):
+        last_trace = st.session_state.get("last_trace")
+        if not last_trace:
+            st.caption("No spans recorded yet: run a task to trace it.")
+        else:
+            root = last_trace[0]
+            st.caption(f"{root['attributes'].get('task', root['name'])}: {root['duration_ms']:.0f} ms")
+            depths = span_depths(last_trace)
+            st.dataframe([
+                {
+                    "span": "  " * depths[item["span_id"]] + item["name"],
+                    "ms": round(item["duration_ms"], 1),
+                    "prompt tokens": item["attributes"].get("prompt_tokens"),
+                    "completion tokens": item["attributes"].get("completion_tokens"),
+                    "cache hit": item["attributes"].get("cache_hit"),
+                    "status": item["status"],
+                }
+                for item in last_trace
+            ], hide_index=True)
+            st.dataframe(summarize_spans(last_trace), hide_index=True)
+        spans = recent_spans(session_trace_ids)
+        st.download_button("Download spans (JSONL)", to_jsonl(spans), "spans.jsonl", "application/x-ndjson")
+        st.download_button(
+            "Download spans (OpenTelemetry JSON)", json.dumps(to_otlp(spans)), "spans.otlp.json", "application/json"
+        )
@@ -0,0 +1,107 @@
+import re
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+class NumericRecord(NamedTuple):
+    """A number found in the text, with its parsed value and position"""
+
+    kind: str  # percentage, p_value, mean_sd, currency, sample_size, unit_measure or year
+    value: float
+    unit: str  # %, comparator of a p-value, currency symbol, or unit of measure
+    page: int  # 1-based page number, 0 when the text has no pages
+    offset: int  # character offset in the document text
+    text: str  # matched text
+    spread: Optional[float] = None  # standard deviation of a mean ± SD
+
+_NUMBER = r"\d+(?:\.\d+)?"
+_CURRENCY_SCALE = {"": 1.0, "K": 1e3, "M": 1e6, "B": 1e9}
+
+# One alternation compiled once, so the text is scanned in a single pass.
+# Every alternative starts with a character class and checks the word
+# boundary with a lookbehind afterwards, which lets the regex engine skip
+# ahead to candidate characters instead of trying each alternative at every
+# position. The number branch is shared by the kinds that end in a suffix.
+NUMBER_PATTERN = re.compile(rf"""
+    \$(?P<amount>{_NUMBER})(?P<scale>[MBK]?)\b
+  | [pP](?<!\w[pP])\s*(?P<p_op>[<>=≤≥])\s*(?P<p>\d*\.?\d+)
+  | (?P<number>\d(?<!\w\d)\d*(?:\.\d+)?)
+    (?:
+        \s*±\s*(?P<sd>{_NUMBER})
+      | \s?(?P<percent>%)
+      | \s*(?P<count_unit>(?i:participants|subjects|samples|cases))\b
+      | \s*(?P<measure_unit>(?i:kg|g|cm|mm|m|seconds?|minutes?|hours?|days?))\b
+    )
+  | (?P<year>[12](?<!\w[12])\d{{3}})\b
+""", re.VERBOSE)
+
+def _record(match, page, base):
+    text = match.group()
+    offset = base + match.start()
+    if match["number"] is not None:
+        value = float(match["number"])
+        if match["sd"] is not None:
+            return NumericRecord("mean_sd", value, "", page, offset, text, float(match["sd"]))
+        if match["percent"] is not None:
+            return NumericRecord("percentage", value, "%", page, offset, text)
+        if match["count_unit"] is not None:
+            return NumericRecord("sample_size", value, "", page, offset, text)
+        return NumericRecord("unit_measure", value, match["measure_unit"].lower(), page, offset, text)
+    if match["p"] is not None:
+        return NumericRecord("p_value", float(match["p"]), match["p_op"], page, offset, text)
+    if match["amount"] is not None:
+        return NumericRecord("currency", float(match["amount"]) * _CURRENCY_SCALE[match["scale"]], "$", page, offset, text)
+    year = int(match["year"])
+    if 1900 <= year <= 2099:
+        return NumericRecord("year", float(year), "", page, offset, text)
+    return None
+
+def extract_numbers(pages, page_offsets=None, base_offset=0):
+    """
+    Extract typed numeric records from page text in one pass
+
+    Args:
+        pages: List of page texts, or a single string
+        page_offsets: Start offset of each page in the document text (optional,
+            defaults to pages joined with newlines)
+        base_offset: Offset of the document within a larger text
+
+    Yields:
+        NumericRecord: Records in text order
+    """
+    if isinstance(pages, str):
+        for match in NUMBER_PATTERN.finditer(pages):
+            record = _record(match, 0, base_offset)
+            if record is not None:
+                yield record
+        return
+
+    offset = 0
+    for number, text in enumerate(pages, start=1):
+        if page_offsets is not None:
+            offset = page_offsets[number - 1]
+        for match in NUMBER_PATTERN.finditer(text):
+            record = _record(match, number, base_offset + offset)
+            if record is not None:
+                yield record
+        offset += len(text) + 1
+
+def summarize_numbers(records, limit=5):
+    """
+    Describe extracted records per kind for the analysis prompt
+
+    Args:
+        records: List of NumericRecord
+        limit: Number of example values listed per kind
+
+    Returns:
+        str: One line per kind with count, range and example values
+    """
+    by_kind = defaultdict(list)
+    for record in records:
+        by_kind[record.kind].append(record)
+    lines = []
+    for kind, items in by_kind.items():
+        values = [item.value for item in items]
+        examples = ", ".join(item.text for item in items[:limit])
+        lines.append(f"{kind}: {len(items)} found, range {min(values):g} to {max(values):g} (e.g. {examples})")
+    return "\n".join(lines)
@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+REPORT_SECTIONS = {
+    "summary": "📝 Summary",
+    "citation": "📎 Citation",
+    "visual_insights": "📊 Visual Insights",
+    "gaps": "🔍 Research Gaps",
+    "ideas": "💡 Research Ideas",
+    "debate": "🎭 Debate",
+}
+
+async def run_dag(nodes, on_result=None):
+    """
+    Run a dependency graph of blocking functions concurrently on asyncio
+    
+    Each node starts in a worker thread as soon as all of its dependencies
+    have finished, so the total latency equals the critical path. A node
+    whose dependency failed is not run and reports the upstream error.
+    
+    Args:
+        nodes: Dict of name -> (list of dependency names, function(results) -> value)
+        on_result: Callback(name, value, error, seconds) called as each node finishes (optional)
+        
+    Returns:
+        dict: Dict of name -> {"value", "error", "seconds"}
+    """
+    results = {}
+    tasks = {}
+
+    async def run_node(name):
+        deps, fn = nodes[name]
+        for dep in deps:
+            await tasks[dep]
+        start = time.perf_counter()
+        failed = [dep for dep in deps if results[dep]["error"] is not None]
+        if failed:
+            value, error = None, RuntimeError(f"skipped because {', '.join(failed)} failed")
+        else:
+            try:
+                value, error = await asyncio.to_thread(fn, {dep: results[dep]["value"] for dep in deps}), None
+            except Exception as e:
+                value, error = None, e
+        results[name] = {"value": value, "error": error, "seconds": time.perf_counter() - start}
+        if on_result is not None:
+            on_result(name, value, error, results[name]["seconds"])
+
+    for name in nodes:
+        tasks[name] = asyncio.ensure_future(run_node(name))
+    await asyncio.gather(*tasks.values())
+    return results
+
+def build_report_nodes(llm, documents, parsed_documents, vectorstore=None):
+    """
+    Build the agent dependency graph of a full report
+    
+    Citation and visual insights run in parallel with the summary; gaps
+    follow the summary, then ideas (after gaps) and debate (after the
+    summary) run in parallel.
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        parsed_documents: List of parsed documents (for visual insights)
+        vectorstore: FAISS vector store, used to pack the citation context (optional)
+        
+    Returns:
+        dict: Nodes for run_dag
+    """
+    from artifact_pipeline import get_artifact, artifact_text
+    from citation_generator import generate_citation, get_citation_prompt
+    from context_packer import pack_context
+    from debate_simulator import simulate_debate
+    from idea_generator import suggest_research_ideas
+    from visualization import generate_visual_insights
+
+    def citation(_):
+        citation_docs, _ = pack_context(
+            documents, get_citation_prompt(), vectorstore,
+            query="title, authors, affiliations, journal or conference and publication year of the paper",
+            lambda_mult=0.9,
+        )
+        return generate_citation(llm, citation_docs)
+
+    return {
+        "summary": ([], lambda _: get_artifact("summary", llm, documents)),
+        "citation": ([], citation),
+        "visual_insights": ([], lambda _: generate_visual_insights(llm, parsed_documents)),
+        "gaps": (["summary"], lambda _: artifact_text(get_artifact("gaps", llm, documents))),
+        "ideas": (["gaps"], lambda _: artifact_text(suggest_research_ideas(llm, documents))),
+        "debate": (["summary"], lambda _: artifact_text(simulate_debate(llm, documents))),
+    }
+
+def result_to_json(name, value):
+    """
+    Convert an agent result to JSON-serializable data
+    
+    Args:
+        name: Agent name (see REPORT_SECTIONS)
+        value: Result returned by its report node
+        
+    Returns:
+        dict or str: Visual insights as a dict, the generated text otherwise
+    """
+    from artifact_pipeline import artifact_text
+
+    if name == "visual_insights":
+        return {
+            "data_summary": value["data_summary"],
+            "ai_analysis": artifact_text(value["ai_analysis"]),
+            "chart": value["chart"],
+            "extracted_numbers": value["extracted_numbers"],
+            "numbers": [record._asdict() for record in value["numbers"]],
+            "tables_found": value["tables_found"],
+            "table_labels": value["table_labels"],
+        }
+    return artifact_text(value)
+
+def run_full_report(llm, documents, parsed_documents, vectorstore=None, on_result=None):
+    """
+    Run every agent on the document as a concurrent dependency graph
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        parsed_documents: List of parsed documents (for visual insights)
+        vectorstore: FAISS vector store (optional)
+        on_result: Callback(name, value, error, seconds) called as each agent finishes (optional)
+        
+    Returns:
+        dict: Dict of agent name -> {"value", "error", "seconds"}
+    """
+    nodes = build_report_nodes(llm, documents, parsed_documents, vectorstore)
+    return asyncio.run(run_dag(nodes, on_result))
\ No newline at end of file
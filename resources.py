@@ -0,0 +1,129 @@
+import functools
+import os
+import time
+
+# Shared model and client objects, created once per process and reused by
+# every Streamlit session and rerun (and by non-UI entry points).
+PROCESS_START = time.perf_counter()
+
+DEFAULT_MODEL = "Llama3-8b-8192"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+
+# Seconds spent constructing each shared resource
+RESOURCE_TIMINGS = {}
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache():
+    """
+    Get the shared persistent LLM response cache
+    
+    Returns:
+        ResponseCache: SQLite-backed response cache
+    """
+    from llm_cache import ResponseCache
+    return ResponseCache()
+
+@functools.lru_cache(maxsize=None)
+def get_scheduler():
+    """
+    Get the shared LLM request scheduler
+    
+    Returns:
+        LLMScheduler: Rate-limit-aware scheduler used by every LLM call
+    """
+    from llm_scheduler import LLMScheduler
+    return LLMScheduler()
+
+@functools.lru_cache(maxsize=None)
+def _get_backend(model_name):
+    start = time.perf_counter()
+    if LLM_BACKEND == "fake":
+        from fake_llm import FakeChatModel
+        llm = FakeChatModel(model_name=model_name, first_token_latency=0.2, token_latency=0.01)
+    else:
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(groq_api_key=os.getenv("GROQ_API_KEY"), model_name=model_name)
+    RESOURCE_TIMINGS[f"llm:{model_name}"] = time.perf_counter() - start
+    return llm
+
+@functools.lru_cache(maxsize=None)
+def get_llm(model_name=DEFAULT_MODEL, priority=None):
+    """
+    Get the shared chat model
+    
+    Responses are served from the persistent response cache when the same
+    prompt was already sent with the same model and parameters; every other
+    call goes through the shared rate-limit-aware scheduler. Set
+    LLM_BACKEND=fake to use the deterministic local fake model.
+    
+    Args:
+        model_name: Groq model name
+        priority: Scheduler priority (llm_scheduler.INTERACTIVE, NORMAL or BATCH)
+        
+    Returns:
+        BaseChatModel: Language model instance
+    """
+    from llm_cache import CachedChatModel
+    from llm_scheduler import ScheduledChatModel, NORMAL
+    llm = ScheduledChatModel(
+        llm=_get_backend(model_name),
+        scheduler=get_scheduler(),
+        priority=NORMAL if priority is None else priority,
+    )
+    return CachedChatModel(llm=llm, response_cache=get_response_cache())
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_cache():
+    """
+    Get the shared persistent per-chunk embedding cache
+    
+    Returns:
+        EmbeddingCache: SQLite-backed embedding cache
+    """
+    from embedding_backend import EmbeddingCache
+    return EmbeddingCache()
+
+@functools.lru_cache(maxsize=None)
+def get_embedding(model_name=EMBEDDING_MODEL):
+    """
+    Get the shared embedding model
+    
+    Chunks already embedded (in any corpus) come from the persistent
+    embedding cache and duplicates are embedded once; the rest is encoded
+    in length-sorted batches. EMBEDDING_RUNTIME selects the CPU runtime
+    (torch, int8 or onnx). Set EMBEDDING_BACKEND=fake to use deterministic
+    hash-based embeddings (offline tests and benchmarks).
+    
+    Args:
+        model_name: Sentence-transformers model name
+        
+    Returns:
+        Embeddings: Embedding model
+    """
+    from embedding_backend import CachedEmbeddings
+    start = time.perf_counter()
+    if EMBEDDING_BACKEND == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+        encoder = DeterministicFakeEmbedding(size=384)
+    else:
+        from embedding_backend import SentenceTransformerEmbeddings
+        encoder = SentenceTransformerEmbeddings(model_name)
+    embedding = CachedEmbeddings(encoder, get_embedding_cache())
+    RESOURCE_TIMINGS[f"embedding:{model_name}"] = time.perf_counter() - start
+    return embedding
+
+@functools.lru_cache(maxsize=None)
+def get_reranker():
+    """
+    Get the shared cross-encoder reranker
+    
+    Returns:
+        CrossEncoder or None: Reranker, or None if sentence-transformers is not installed
+    """
+    start = time.perf_counter()
+    from hybrid_retriever import load_cross_encoder
+    reranker = load_cross_encoder()
+    RESOURCE_TIMINGS["reranker"] = time.perf_counter() - start
+    return reranker
\ No newline at end of file
@@ -1,5 +1,10 @@
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
+from artifact_pipeline import get_artifact, get_cached_artifact, store_artifact, fingerprint_documents
+from context_packer import count_tokens, context_budget, CHUNK_OVERHEAD_TOKENS
+
+MAX_CONCURRENCY = 4
 
 def get_summary_prompt():
     """Get the prompt template for document summarization"""
@@ -10,10 +15,130 @@ You are a helpful assistant. Summarize the following document clearly and accura
 </context>
 """)
 
+def get_map_prompt():
+    """Get the prompt template for summarizing one section of a document"""
+    return ChatPromptTemplate.from_template("""
+You are a helpful assistant. Summarize the following section of a research paper.
+Keep key methods, results, numbers and limitations:
+<context>
+{context}
+</context>
+""")
+
+def get_reduce_prompt():
+    """Get the prompt template for combining partial summaries"""
+    return ChatPromptTemplate.from_template("""
+You are a helpful assistant. The following are summaries of consecutive sections of a research paper.
+Combine them into a single clear and accurate summary of the whole document:
+<context>
+{context}
+</context>
+""")
+
+def group_documents(documents, max_tokens):
+    """
+    Split documents into consecutive groups that fit the context window
+    
+    Args:
+        documents: List of document chunks
+        max_tokens: Maximum number of context tokens per group
+        
+    Returns:
+        list: List of document groups
+    """
+    groups = []
+    current = []
+    size = 0
+    for doc in documents:
+        length = _document_tokens(doc)
+        if current and size + length > max_tokens:
+            groups.append(current)
+            current = []
+            size = 0
+        current.append(doc)
+        size += length
+    if current:
+        groups.append(current)
+    return groups
+
+def _document_tokens(doc):
+    return count_tokens(doc.page_content) + CHUNK_OVERHEAD_TOKENS
+
+def _total_tokens(documents):
+    return sum(_document_tokens(doc) for doc in documents)
+
+def _max_tokens():
+    # Budget of the most verbose of the summary prompts
+    return min(context_budget(prompt) for prompt in (get_summary_prompt(), get_map_prompt(), get_reduce_prompt()))
+
+def _map_reduce_context(llm, documents, max_tokens=None, max_concurrency=MAX_CONCURRENCY):
+    """Summarize chunk groups in parallel and reduce them level by level until they fit one call"""
+    max_tokens = max_tokens or _max_tokens()
+    config = {"max_concurrency": max_concurrency}
+    map_chain = create_stuff_documents_chain(llm, get_map_prompt())
+    reduce_chain = create_stuff_documents_chain(llm, get_reduce_prompt())
+    
+    # Map: summarize each group of chunks in parallel
+    groups = group_documents(documents, max_tokens)
+    summaries = [Document(page_content=text) for text in map_chain.batch([{"context": group} for group in groups], config=config)]
+    
+    # Reduce: combine partial summaries until one call can take them all
+    while len(summaries) > 1 and _total_tokens(summaries) > max_tokens:
+        groups = group_documents(summaries, max_tokens)
+        if len(groups) == len(summaries):
+            # Each partial fills a group on its own; pair them so the tree shrinks
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        partials = reduce_chain.batch([{"context": group} for group in groups], config=config)
+        summaries = [Document(page_content=text) for text in partials]
+    return summaries
+
+def summarize_document_hierarchical(llm, documents, max_tokens=None, max_concurrency=MAX_CONCURRENCY):
+    """
+    Summarize a whole document with a parallel map-reduce tree
+    
+    Chunk groups are summarized concurrently, then the partial summaries are
+    reduced level by level until they fit in a single call. Wall-clock time
+    grows with the depth of the tree rather than with the number of chunks.
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        max_tokens: Maximum number of context tokens sent per LLM call
+        max_concurrency: Maximum number of concurrent LLM calls
+        
+    Returns:
+        str: Document summary
+    """
+    summaries = _map_reduce_context(llm, documents, max_tokens, max_concurrency)
+    if len(summaries) == 1:
+        return summaries[0].page_content
+    reduce_chain = create_stuff_documents_chain(llm, get_reduce_prompt())
+    return reduce_chain.invoke({"context": summaries})
+
+def build_summary(llm, documents):
+    """
+    Summarize documents with a single call when they fit, map-reduce otherwise
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        
+    Returns:
+        str: Document summary
+    """
+    if _total_tokens(documents) <= _max_tokens():
+        chain = create_stuff_documents_chain(llm, get_summary_prompt())
+        return chain.invoke({"context": documents})
+    return summarize_document_hierarchical(llm, documents)
+
 def summarize_document(llm, documents):
     """
     Summarize the uploaded document(s)
     
+    The summary is cached per document set and reused by the gap, idea
+    and debate agents. Documents larger than the context window are
+    summarized with the map-reduce tree.
+    
     Args:
         llm: Language model instance
         documents: List of document chunks
@@ -21,6 +146,41 @@ def summarize_document(llm, documents):
     Returns:
         str: Document summary
     """
-    summary_prompt = get_summary_prompt()
-    chain = create_stuff_documents_chain(llm, summary_prompt)
-    return chain.invoke({"context": documents})
\ No newline at end of file
+    return get_artifact("summary", llm, documents)
+
+def summarize_document_stream(llm, documents):
+    """
+    Summarize the uploaded document(s), yielding tokens as they arrive
+    
+    For map-reduce summaries only the final reduce call is streamed.
+    
+    Args:
+        llm: Language model instance
+        documents: List of document chunks
+        
+    Yields:
+        str: Summary tokens
+    """
+    fingerprint = fingerprint_documents(documents, llm)
+    cached = get_cached_artifact("summary", fingerprint)
+    if cached is not None:
+        yield cached
+        return
+    
+    if _total_tokens(documents) <= _max_tokens():
+        context = documents
+        chain = create_stuff_documents_chain(llm, get_summary_prompt())
+    else:
+        context = _map_reduce_context(llm, documents)
+        chain = create_stuff_documents_chain(llm, get_reduce_prompt()) if len(context) > 1 else None
+    
+    if chain is None:
+        summary = context[0].page_content
+        yield summary
+    else:
+        parts = []
+        for token in chain.stream({"context": context}):
+            parts.append(token)
+            yield token
+        summary = "".join(parts)
+    store_artifact("summary", fingerprint, summary)
\ No newline at end of file
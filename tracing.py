@@ -0,0 +1,357 @@
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Finished traces are appended here as JSONL when set
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+MAX_RECENT_SPANS = 2000
+
+# Spans of every trace, newest last, for the debug panel and exports
+RECENT_SPANS = deque(maxlen=MAX_RECENT_SPANS)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_lock = threading.Lock()
+
+class Span:
+    """A timed operation with attributes, nested under its parent span"""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.end = None
+        self.status = "ok"
+        self.error = None
+        self._started = time.perf_counter()
+        self._finished = None
+
+    @property
+    def duration_ms(self):
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return (end - self._started) * 1000
+
+    def set(self, **attributes):
+        """Set or update span attributes"""
+        self.attributes.update(attributes)
+
+    def finish(self, error=None):
+        self._finished = time.perf_counter()
+        self.end = self.start + (self._finished - self._started)
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+class Trace:
+    """Spans recorded while a trace is active, in finishing order"""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self.root = None
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dicts(self):
+        """Span dicts sorted by start time"""
+        with self._lock:
+            return [span.to_dict() for span in sorted(self.spans, key=lambda span: span.start)]
+
+def _open(name, attributes):
+    parent = _current_span.get()
+    trace = _current_trace.get()
+    trace_id = parent.trace_id if parent else (trace.trace_id if trace else secrets.token_hex(16))
+    return Span(name, trace_id, parent.span_id if parent else None, attributes), parent, trace
+
+def _close(current, trace, error=None):
+    current.finish(error)
+    if trace is not None:
+        trace.add(current)
+    with _lock:
+        RECENT_SPANS.append(current)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a span of the current trace
+
+    Spans opened inside the block (in the same thread, or in threads and
+    tasks started with a copy of the context) become its children.
+
+    Args:
+        name: Span name, e.g. "parse_pdfs" or "llm"
+        **attributes: Initial span attributes
+
+    Yields:
+        Span: The open span, whose attributes can still be set
+    """
+    current, parent, trace = _open(name, attributes)
+    # Restored by value rather than with a reset token, so a span may be
+    # closed from another context
+    _current_span.set(current)
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        _current_span.set(parent)
+        _close(current, trace, error)
+
+@contextmanager
+def leaf_span(name, **attributes):
+    """
+    Like span, but without becoming the parent of spans opened meanwhile
+
+    Meant for generators: a span held open across yields would otherwise
+    adopt whatever the consumer does between chunks.
+    """
+    current, _, trace = _open(name, attributes)
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        _close(current, trace, error)
+
+def traced(name):
+    """Decorator running every call of a function in a span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def annotate(**attributes):
+    """Set attributes on the innermost open span, if any"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+def begin_trace(name, **attributes):
+    """
+    Start a trace whose root span stays open until end_trace
+
+    For code that cannot be wrapped in a with block, such as a whole
+    Streamlit script run.
+
+    Args:
+        name: Trace name, e.g. the task being run
+        **attributes: Root span attributes
+
+    Returns:
+        Trace: The trace being recorded
+    """
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    trace.root = _open(name, attributes)[0]
+    _current_span.set(trace.root)
+    return trace
+
+def end_trace(trace, error=None):
+    """
+    Close the root span of a trace started with begin_trace
+
+    When TRACE_EXPORT_PATH is set, the finished trace is appended to it as
+    JSONL.
+    """
+    _close(trace.root, trace, error)
+    _current_span.set(None)
+    _current_trace.set(None)
+    if TRACE_EXPORT_PATH:
+        export_jsonl(trace.to_dicts(), TRACE_EXPORT_PATH)
+
+@contextmanager
+def start_trace(name, **attributes):
+    """
+    Collect every span opened inside the block into a new trace
+
+    Args:
+        name: Trace name, e.g. the task being run
+        **attributes: Root span attributes
+
+    Yields:
+        Trace: The trace being recorded
+    """
+    trace = begin_trace(name, **attributes)
+    error = None
+    try:
+        yield trace
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        end_trace(trace, error)
+
+def span_depths(spans):
+    """Nesting depth of each span dict, by span_id"""
+    parents = {item["span_id"]: item["parent_id"] for item in spans}
+    depths = {}
+    for span_id in parents:
+        depth, parent = 0, parents[span_id]
+        while parent in parents:
+            depth, parent = depth + 1, parents[parent]
+        depths[span_id] = depth
+    return depths
+
+def record_llm_call(current, messages, text, usage=None, cache_hit=False, model=None):
+    """
+    Set the token counts and cache status of an LLM call span
+
+    Args:
+        current: The call's span
+        messages: Prompt messages
+        text: Completion text
+        usage: Provider usage metadata with input/output token counts (optional)
+        cache_hit: Whether the response came from the response cache
+        model: Model name (optional)
+    """
+    from context_packer import count_tokens
+
+    usage = usage or {}
+    current.set(
+        model=model,
+        cache_hit=cache_hit,
+        prompt_tokens=usage.get("input_tokens") or sum(count_tokens(str(m.content)) for m in messages),
+        completion_tokens=usage.get("output_tokens") or count_tokens(text),
+    )
+
+def summarize_spans(spans):
+    """
+    Aggregate span dicts by name
+
+    Args:
+        spans: List of span dicts
+
+    Returns:
+        list: One row per span name with count, total and max duration, tokens and cache hits
+    """
+    rows = {}
+    for item in spans:
+        row = rows.setdefault(item["name"], {
+            "name": item["name"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0,
+        })
+        attributes = item["attributes"]
+        row["count"] += 1
+        row["total_ms"] += item["duration_ms"]
+        row["max_ms"] = max(row["max_ms"], item["duration_ms"])
+        row["prompt_tokens"] += attributes.get("prompt_tokens") or 0
+        row["completion_tokens"] += attributes.get("completion_tokens") or 0
+        row["cache_hits"] += 1 if attributes.get("cache_hit") else 0
+    return sorted(rows.values(), key=lambda row: row["total_ms"], reverse=True)
+
+def recent_spans(trace_ids=None):
+    """
+    Span dicts of the most recent spans, oldest first
+
+    Args:
+        trace_ids: Only return spans of these traces (optional; the buffer is
+            shared by every session of the process)
+
+    Returns:
+        list: Span dicts
+    """
+    with _lock:
+        spans = list(RECENT_SPANS)
+    if trace_ids is not None:
+        trace_ids = set(trace_ids)
+        spans = [item for item in spans if item.trace_id in trace_ids]
+    return [item.to_dict() for item in spans]
+
+def to_jsonl(spans):
+    """Serialize span dicts as JSON lines"""
+    return "".join(json.dumps(item, default=str) + "\n" for item in spans)
+
+def export_jsonl(spans, path):
+    """Append span dicts to a JSONL file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(to_jsonl(spans))
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(spans, service_name="research-assistant"):
+    """
+    Convert span dicts to the OpenTelemetry OTLP/JSON trace format
+
+    The result can be loaded by OpenTelemetry collectors and viewers that
+    accept OTLP JSON files.
+
+    Args:
+        spans: List of span dicts
+        service_name: service.name resource attribute
+
+    Returns:
+        dict: OTLP JSON document
+    """
+    otlp_spans = []
+    for item in spans:
+        otlp_span = {
+            "traceId": item["trace_id"],
+            "spanId": item["span_id"],
+            "name": item["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(int(item["start"] * 1e9)),
+            "endTimeUnixNano": str(int((item["end"] or item["start"]) * 1e9)),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in item["attributes"].items() if value is not None
+            ],
+            "status": {"code": 2, "message": item["error"]} if item["status"] == "error" else {"code": 1},
+        }
+        if item["parent_id"]:
+            otlp_span["parentSpanId"] = item["parent_id"]
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": otlp_spans}],
+        }]
+    }
+
+def export_otlp(spans, path):
+    """Write span dicts to an OTLP JSON file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_otlp(spans), f)
@@ -1,6 +1,22 @@
-from langchain.chains import LLMChain
+import contextvars
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
+# Segments stay well inside the 8192-token window of Llama3-8b-8192,
+# leaving room for the translated output.
+MAX_SEGMENT_CHARS = 4000
+MAX_CONCURRENCY = 4
+MAX_CACHED_SEGMENTS = 2048
+
+# (segment hash, language) -> translated segment
+_segment_cache = OrderedDict()
+_segment_lock = threading.Lock()
+
 def get_translate_prompt():
     """Get the prompt template for translation"""
     return ChatPromptTemplate.from_template("""
@@ -8,10 +24,82 @@ Translate the following content into {language}, preserving meaning and academic
 {content}
 """)
 
+def _content_text(content):
+    # Handle dictionary output
+    if isinstance(content, dict):
+        return "\n\n".join(str(v) for v in content.values())
+    return str(content)
+
+def _split_long_paragraph(paragraph, max_chars):
+    pieces = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_segments(text, max_chars=MAX_SEGMENT_CHARS):
+    """
+    Split text into translation segments on paragraph and section boundaries
+    
+    Args:
+        text: Text to split
+        max_chars: Maximum number of characters per segment
+        
+    Returns:
+        list: List of text segments
+    """
+    segments = []
+    current = []
+    size = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph] if len(paragraph) <= max_chars else _split_long_paragraph(paragraph, max_chars)
+        for piece in pieces:
+            # Section headings always start a new segment
+            starts_section = piece.startswith("#")
+            if current and (starts_section or size + len(piece) + 2 > max_chars):
+                segments.append("\n\n".join(current))
+                current = []
+                size = 0
+            current.append(piece)
+            size += len(piece) + 2
+    if current:
+        segments.append("\n\n".join(current))
+    return segments
+
+def _segment_key(segment, language):
+    return (hashlib.sha256(segment.encode("utf-8")).hexdigest(), language.strip().lower())
+
+def _get_cached_segment(key):
+    with _segment_lock:
+        if key not in _segment_cache:
+            return None
+        _segment_cache.move_to_end(key)
+        return _segment_cache[key]
+
+def _store_segment(key, translation):
+    with _segment_lock:
+        _segment_cache[key] = translation
+        _segment_cache.move_to_end(key)
+        while len(_segment_cache) > MAX_CACHED_SEGMENTS:
+            _segment_cache.popitem(last=False)
+
 def translate_text(llm, content, language):
     """
     Translate content to specified language
     
+    Content is split on paragraph and section boundaries and the segments
+    are translated concurrently. Each segment is cached by (hash, language),
+    so re-translating edited output only pays for the segments that changed.
+    
     Args:
         llm: Language model instance
         content: Content to translate
@@ -20,16 +108,65 @@ def translate_text(llm, content, language):
     Returns:
         str: Translated content
     """
-    # Handle dictionary output
-    if isinstance(content, dict):
-        combined_text = "\n\n".join(str(v) for v in content.values())
-    else:
-        combined_text = str(content)
-    
-    translate_prompt = get_translate_prompt()
-    translate_chain = LLMChain(llm=llm, prompt=translate_prompt)
-    result = translate_chain.invoke({
-        "language": language,
-        "content": combined_text
-    })
-    return result
\ No newline at end of file
+    segments = split_segments(_content_text(content))
+    keys = [_segment_key(segment, language) for segment in segments]
+    translations = [_get_cached_segment(key) for key in keys]
+    
+    missing = [i for i, translation in enumerate(translations) if translation is None]
+    if missing:
+        translate_chain = get_translate_prompt() | llm | StrOutputParser()
+        results = translate_chain.batch(
+            [{"language": language, "content": segments[i]} for i in missing],
+            config={"max_concurrency": MAX_CONCURRENCY},
+        )
+        for i, result in zip(missing, results):
+            translations[i] = result
+            _store_segment(keys[i], result)
+    
+    return "\n\n".join(translations)
+
+def translate_text_stream(llm, content, language):
+    """
+    Translate content to specified language, yielding tokens as they arrive
+    
+    The first uncached segment is streamed token by token while the
+    remaining segments are translated concurrently in the background.
+    
+    Args:
+        llm: Language model instance
+        content: Content to translate
+        language: Target language
+        
+    Yields:
+        str: Translated content tokens
+    """
+    segments = split_segments(_content_text(content))
+    keys = [_segment_key(segment, language) for segment in segments]
+    translations = [_get_cached_segment(key) for key in keys]
+    missing = [i for i, translation in enumerate(translations) if translation is None]
+    translate_chain = get_translate_prompt() | llm | StrOutputParser()
+    
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as pool:
+        # Run in a copy of the context so the prefetched calls join the current trace
+        futures = {
+            i: pool.submit(
+                contextvars.copy_context().run, translate_chain.invoke, {"language": language, "content": segments[i]}
+            )
+            for i in missing[1:]
+        }
+        for i, segment in enumerate(segments):
+            if i > 0:
+                yield "\n\n"
+            if translations[i] is not None:
+                yield translations[i]
+                continue
+            if i in futures:
+                translation = futures[i].result()
+                yield translation
+            else:
+                parts = []
+                for token in translate_chain.stream({"language": language, "content": segment}):
+                    parts.append(token)
+                    yield token
+                translation = "".join(parts)
+            _store_segment(keys[i], translation)
\ No newline at end of file
@@ -0,0 +1,217 @@
+import math
+import os
+import uuid
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+# Index structure: "auto" picks one by corpus size, or one of INDEX_KINDS
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "auto")
+# auto keeps the exact flat index below this many vectors, then uses IVF with
+# 8-bit scalar quantization (4x smaller), and OPQ-rotated product
+# quantization (~18x smaller, lower recall) from VECTOR_PQ_MIN vectors
+VECTOR_FLAT_MAX = int(os.getenv("VECTOR_FLAT_MAX", "20000"))
+VECTOR_PQ_MIN = int(os.getenv("VECTOR_PQ_MIN", "500000"))
+# Recall/latency knob of the approximate indexes, from 0 (fastest) to 1 (exhaustive)
+VECTOR_SEARCH_EFFORT = float(os.getenv("VECTOR_SEARCH_EFFORT", "0.1"))
+# Vectors sampled to train the IVF centroids and quantizers
+VECTOR_TRAIN_SAMPLE = int(os.getenv("VECTOR_TRAIN_SAMPLE", "100000"))
+
+INDEX_KINDS = ("flat", "hnsw", "hnsw_sq", "ivf", "ivf_sq", "ivf_pq")
+# Kinds chosen by auto, from exact to most compressed
+_AUTO_KINDS = ("flat", "ivf_sq", "ivf_pq")
+HNSW_M = 32
+# FAISS wants at least this many training points per centroid
+_POINTS_PER_CENTROID = 39
+
+def choose_index_kind(count, mode=VECTOR_INDEX):
+    """
+    Pick the index structure for a number of vectors
+
+    Args:
+        count: Number of vectors
+        mode: "auto" or one of INDEX_KINDS
+
+    Returns:
+        str: Index kind
+    """
+    if mode != "auto":
+        if mode not in INDEX_KINDS:
+            raise ValueError(f"Unknown VECTOR_INDEX {mode!r}, expected auto or one of {', '.join(INDEX_KINDS)}")
+        return mode
+    if count < VECTOR_FLAT_MAX:
+        return "flat"
+    return "ivf_pq" if count >= VECTOR_PQ_MIN else "ivf_sq"
+
+def _nlist(count):
+    return max(1, min(int(4 * math.sqrt(count)), count // _POINTS_PER_CENTROID))
+
+def _pq_layout(count, dim):
+    # One byte codes over 8-dimension subvectors, with fewer bits when there
+    # are too few vectors to train 256 centroids per subquantizer
+    m = next(m for m in range(max(dim // 8, 1), 0, -1) if dim % m == 0)
+    nbits = min(8, max(4, int(math.log2(max(count, 1) / _POINTS_PER_CENTROID))))
+    return m, nbits
+
+def index_factory_string(kind, count, dim):
+    """FAISS index_factory description of an index kind for count vectors of dim dimensions"""
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{HNSW_M}"
+    if kind == "hnsw_sq":
+        return f"HNSW{HNSW_M}_SQ8"
+    nlist = _nlist(count)
+    if kind == "ivf":
+        return f"IVF{nlist},Flat"
+    if kind == "ivf_sq":
+        return f"IVF{nlist},SQ8"
+    m, nbits = _pq_layout(count, dim)
+    if nbits < 8:
+        return f"IVF{nlist},PQ{m}x{nbits}"
+    # The OPQ rotation balances variance across subvectors, which raises PQ
+    # recall a lot; it needs enough vectors to train 8-bit codes
+    return f"OPQ{m},IVF{nlist},PQ{m}x{nbits}"
+
+def _ivf(index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+def index_kind(index):
+    """Index kind (see INDEX_KINDS) of a FAISS index"""
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf = faiss.downcast_index(ivf)
+        if isinstance(ivf, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(ivf, faiss.IndexIVFScalarQuantizer):
+            return "ivf_sq"
+        return "ivf"
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSWSQ):
+        return "hnsw_sq"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+def set_search_effort(index, effort=VECTOR_SEARCH_EFFORT):
+    """
+    Set the recall/latency trade-off of an approximate index
+
+    IVF indexes probe that fraction of their lists; HNSW indexes scale the
+    candidate list (efSearch) between 16 and 512. Flat indexes are exact and
+    unaffected.
+
+    Args:
+        index: FAISS index
+        effort: From 0 (fastest) to 1 (exhaustive)
+    """
+    effort = min(max(effort, 0.0), 1.0)
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf.nprobe = max(1, math.ceil(effort * ivf.nlist))
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = 16 + int(effort * 496)
+
+def build_index(vectors, kind, seed=0):
+    """
+    Build and fill a FAISS index of the given kind
+
+    Indexes that need training are trained on a random sample of at most
+    VECTOR_TRAIN_SAMPLE vectors. IVF indexes keep a direct map from label to
+    list entry, so stored vectors can still be reconstructed (the context
+    packer relies on it).
+
+    Args:
+        vectors: float32 array of shape (count, dim)
+        kind: Index kind (see INDEX_KINDS)
+        seed: Seed of the training sample
+
+    Returns:
+        faiss.Index: The filled index
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    index = faiss.index_factory(dim, index_factory_string(kind, count, dim))
+    if not index.is_trained:
+        sample = vectors
+        if count > VECTOR_TRAIN_SAMPLE:
+            sample = vectors[np.random.default_rng(seed).choice(count, VECTOR_TRAIN_SAMPLE, replace=False)]
+        index.train(sample)
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    index.add(vectors)
+    set_search_effort(index)
+    return index
+
+def from_documents(documents, embedding, ids=None, kind="flat"):
+    """
+    Create a FAISS vector store with an index of the given kind
+
+    Args:
+        documents: List of document chunks
+        embedding: Embedding model
+        ids: Vector store IDs of the chunks (optional)
+        kind: Index kind (see INDEX_KINDS)
+
+    Returns:
+        FAISS: Vector store
+    """
+    if kind == "flat":
+        return FAISS.from_documents(documents, embedding, ids=ids)
+    vectors = np.asarray(embedding.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    ids = ids or [str(uuid.uuid4()) for _ in documents]
+    return FAISS(embedding, build_index(vectors, kind), InMemoryDocstore(dict(zip(ids, documents))), dict(enumerate(ids)))
+
+def _rebuild(vectorstore, positions, kind):
+    vectors = vectorstore.index.reconstruct_batch(np.asarray(positions, dtype=np.int64))
+    index_to_docstore_id = {i: vectorstore.index_to_docstore_id[position] for i, position in enumerate(positions)}
+    if kind == index_kind(vectorstore.index):
+        # Keep the trained centroids and quantizers
+        vectorstore.index.reset()
+        vectorstore.index.add(vectors)
+    else:
+        vectorstore.index = build_index(vectors, kind)
+    vectorstore.index_to_docstore_id = index_to_docstore_id
+
+def remove_vectors(vectorstore, ids):
+    """
+    Delete chunks from a vector store by ID, whatever its index kind
+
+    FAISS.delete assumes a flat index: HNSW indexes cannot remove vectors,
+    and IVF indexes keep the original labels of the remaining ones. Those
+    are refilled with the remaining vectors instead.
+
+    Args:
+        vectorstore: FAISS vector store
+        ids: Vector store IDs to delete
+    """
+    if index_kind(vectorstore.index) == "flat":
+        vectorstore.delete(ids)
+        return
+    removed = set(ids)
+    positions = sorted(i for i, docstore_id in vectorstore.index_to_docstore_id.items() if docstore_id not in removed)
+    _rebuild(vectorstore, positions, index_kind(vectorstore.index))
+    vectorstore.docstore.delete(list(removed))
+
+def fit_index(vectorstore, mode=VECTOR_INDEX):
+    """
+    Move a grown vector store to a more compact index when auto asks for one
+
+    Args:
+        vectorstore: FAISS vector store
+        mode: "auto" or one of INDEX_KINDS
+
+    Returns:
+        FAISS: The same vector store
+    """
+    current = index_kind(vectorstore.index)
+    wanted = choose_index_kind(vectorstore.index.ntotal, mode)
+    if current in _AUTO_KINDS and wanted in _AUTO_KINDS and _AUTO_KINDS.index(wanted) > _AUTO_KINDS.index(current):
+        _rebuild(vectorstore, sorted(vectorstore.index_to_docstore_id), wanted)
+    return vectorstore
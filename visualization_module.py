@@ -1,14 +1,25 @@
-import re
-import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import logging
+import threading
+from collections import OrderedDict
 import numpy as np
+import pandas as pd
 from langchain.chains import LLMChain
 from langchain_core.prompts import ChatPromptTemplate
-import pdfplumber
-import io
+from numeric_extractor import extract_numbers, summarize_numbers
+from document_processor import load_tables
+from chart_renderer import chart_spec, message_spec
+from tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+# Typed DataFrames of each file's tables, keyed by file hash, so charting
+# another table (or re-running the agent) does not convert them again
+MAX_CACHED_TABLE_FILES = 32
+# Share of non-empty cells that must parse as numbers for a numeric column
+NUMERIC_COLUMN_THRESHOLD = 0.5
+
+_frame_cache = OrderedDict()
+_frame_lock = threading.Lock()
 
 def get_data_extraction_prompt():
     """Get the prompt template for data extraction"""
@@ -44,12 +55,122 @@ Please provide:
 Keep the analysis concise but informative.
 """)
 
-def extract_numerical_data_from_pdf(uploaded_files):
+def _column_names(header):
+    """Unique, non-empty column names for a table header row"""
+    names = []
+    for i, name in enumerate(header):
+        name = str(name).strip() if name not in (None, "") else f"Column {i + 1}"
+        while name in names:
+            name = f"{name} ({i + 1})"
+        names.append(name)
+    return names
+
+def typed_table(rows, source=None, page=None):
+    """
+    Convert extracted table rows to a DataFrame with numeric columns typed
+    
+    All cells are coerced to numbers in one vectorized call; columns where
+    most non-empty cells parse become float columns. The numeric column
+    names, source and page are kept in df.attrs.
+    
+    Args:
+        rows: Table rows, the first one being the header
+        source: Source file name (optional)
+        page: Page number (optional)
+        
+    Returns:
+        DataFrame: Typed table
+    """
+    df = pd.DataFrame(rows[1:], columns=_column_names(rows[0]))
+    cells = df.to_numpy(dtype=object).ravel()
+    text = pd.Series(cells, dtype="string").str.replace(r"[,%$\s]", "", regex=True)
+    # Nullable results hold pd.NA, which older pandas cannot cast to float without na_value
+    numbers = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float, na_value=np.nan).reshape(df.shape)
+    filled = (text.fillna("") != "").to_numpy().reshape(df.shape).sum(axis=0)
+    parsed = (~pd.isna(numbers)).sum(axis=0)
+    numeric = (parsed > 0) & (parsed >= NUMERIC_COLUMN_THRESHOLD * filled)
+    
+    numeric_columns = [column for column, is_numeric in zip(df.columns, numeric) if is_numeric]
+    for i in numeric.nonzero()[0]:
+        df[df.columns[i]] = numbers[:, i]
+    df.attrs.update({"numeric_columns": numeric_columns, "source": source, "page": page})
+    return df
+
+def untyped_table(rows, source=None, page=None):
+    """
+    Convert extracted table rows to a DataFrame of text cells, padding ragged rows
+    
+    Args:
+        rows: Table rows, the first one being the header
+        source: Source file name (optional)
+        page: Page number (optional)
+        
+    Returns:
+        DataFrame: Table without numeric columns
+    """
+    width = max(len(row) for row in rows)
+    rows = [list(row) + [None] * (width - len(row)) for row in rows]
+    df = pd.DataFrame(rows[1:], columns=_column_names(rows[0]))
+    df.attrs.update({"numeric_columns": [], "source": source, "page": page})
+    return df
+
+def table_frames(parsed):
     """
-    Extract numerical data from PDF files using pdfplumber
+    Get the typed tables of a parsed document, converting them only once
     
     Args:
-        uploaded_files: List of uploaded PDF files
+        parsed: Parsed document with its tables loaded (see document_processor.load_tables)
+        
+    Returns:
+        list: List of typed DataFrames
+    """
+    key = parsed["file_hash"]
+    with _frame_lock:
+        if key in _frame_cache:
+            _frame_cache.move_to_end(key)
+            return _frame_cache[key]
+    
+    frames = []
+    untyped = 0
+    for table in parsed["tables"]:
+        try:
+            frames.append(typed_table(table["rows"], parsed["name"], table["page"]))
+        except (ValueError, TypeError) as e:
+            # Keep the table, without typed columns
+            logger.warning("Could not type table on page %s of %s: %s", table["page"], parsed["name"], e)
+            frames.append(untyped_table(table["rows"], parsed["name"], table["page"]))
+            untyped += 1
+    if untyped:
+        annotate(untyped_tables=untyped)
+    
+    with _frame_lock:
+        _frame_cache[key] = frames
+        while len(_frame_cache) > MAX_CACHED_TABLE_FILES:
+            _frame_cache.popitem(last=False)
+    return frames
+
+def clear_frame_cache():
+    """Drop every cached typed table"""
+    with _frame_lock:
+        _frame_cache.clear()
+
+def table_label(df):
+    """Short description of a typed table for selection lists"""
+    return f"{df.attrs.get('source')} p.{df.attrs.get('page')} ({len(df)} rows × {len(df.columns)} columns)"
+
+def default_table_index(tables):
+    """Index of the first table with a numeric column, or None"""
+    return next((i for i, df in enumerate(tables) if df.attrs.get('numeric_columns')), None)
+
+def extract_numerical_data_from_pdf(parsed_documents):
+    """
+    Collect tables and text from the parsed PDF documents
+    
+    Tables are extracted on first use, only from the pages that may hold
+    one, and converted to typed DataFrames once per file.
+    
+    Args:
+        parsed_documents: List of parsed documents from document_processor.parse_pdfs
         
     Returns:
         dict: Extracted numerical data and text
@@ -57,35 +178,23 @@ def extract_numerical_data_from_pdf(uploaded_files):
     extracted_data = {
         'tables': [],
         'numerical_text': [],
+        'numbers': [],
         'raw_text': ''
     }
     
-    for file in uploaded_files:
-        # Reset file pointer
-        file.seek(0)
-        
-        with pdfplumber.open(io.BytesIO(file.read())) as pdf:
-            full_text = ""
-            
-            for page in pdf.pages:
-                # Extract text
-                text = page.extract_text()
-                if text:
-                    full_text += text + "\n"
-                
-                # Extract tables
-                tables = page.extract_tables()
-                if tables:
-                    for table in tables:
-                        # Convert table to DataFrame if it has data
-                        if table and len(table) > 1:
-                            try:
-                                df = pd.DataFrame(table[1:], columns=table[0])
-                                extracted_data['tables'].append(df)
-                            except:
-                                pass
-            
-            extracted_data['raw_text'] = full_text
+    load_tables(parsed_documents)
+    texts = []
+    offset = 0
+    for parsed in parsed_documents:
+        text = "\n".join(parsed['pages'])
+        texts.append(text)
+        # Numbers are extracted page by page, with offsets into raw_text
+        extracted_data['numbers'].extend(extract_numbers(parsed['pages'], parsed.get('page_offsets'), offset))
+        offset += len(text) + 1
+        extracted_data['tables'].extend(table_frames(parsed))
+    
+    # Keep the text of every file, not only the last one
+    extracted_data['raw_text'] = "\n".join(texts)
     
     return extracted_data
 
@@ -99,179 +208,128 @@ def extract_numbers_with_regex(text):
     Returns:
         list: List of found numerical patterns
     """
-    patterns = [
-        r'\b\d+\.?\d*%',  # Percentages
-        r'\b\d+\.?\d*\s*(?:participants|subjects|samples|cases)',  # Sample sizes
-        r'p\s*[<>=]\s*\d+\.?\d*',  # P-values
-        r'\b\d+\.?\d*\s*±\s*\d+\.?\d*',  # Mean ± SD
-        r'\$\d+\.?\d*[MBK]?',  # Currency
-        r'\b\d{4}\b',  # Years
-        r'\b\d+\.?\d*\s*(?:kg|g|cm|m|mm|seconds?|minutes?|hours?|days?)',  # Units
-    ]
-    
-    found_numbers = []
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        found_numbers.extend(matches)
-    
-    return found_numbers
+    return [record.text for record in extract_numbers(text)]
 
-def create_sample_charts(extracted_data):
+def create_sample_charts(extracted_data, table_index=None):
     """
-    Create sample charts from extracted data
+    Plan the chart for the extracted data
+    
+    Only a chart spec is built here; figures are rendered by chart_renderer
+    when the chart is displayed. Long series are downsampled rather than
+    skipped.
     
     Args:
         extracted_data: Dictionary containing extracted data
+        table_index: Index of the table to chart (defaults to the first one with numeric columns)
         
     Returns:
-        tuple: (matplotlib figure, plotly figure, data summary)
+        tuple: (chart spec, data summary)
     """
     # Try to create charts from tables first
-    if extracted_data['tables']:
-        df = extracted_data['tables'][0]  # Use first table
+    tables = extracted_data['tables']
+    if table_index is None:
+        table_index = default_table_index(tables)
+    if table_index is not None and table_index < len(tables):
+        df = tables[table_index]
         
-        # Find numerical columns
-        numerical_cols = []
-        for col in df.columns:
-            try:
-                # Try to convert to numeric
-                pd.to_numeric(df[col], errors='coerce')
-                if not df[col].isna().all():
-                    numerical_cols.append(col)
-            except:
-                pass
+        # Numeric columns were detected and typed when the table was converted
+        numerical_cols = df.attrs.get('numeric_columns', [])
         
         if len(numerical_cols) >= 1:
-            # Create bar chart with plotly
-            fig_plotly = px.bar(
-                df, 
-                x=df.columns[0],
-                y=numerical_cols[0] if numerical_cols else df.columns[1],
-                title="Data from Research Paper",
-                color_discrete_sequence=['#1f77b4']
+            value_col = next((col for col in numerical_cols if col != df.columns[0]), numerical_cols[0])
+            chart = chart_spec(
+                "Data from Research Paper", df[df.columns[0]].astype(str), df[value_col],
+                x_label=str(df.columns[0]), y_label=str(value_col),
             )
             
-            # Create matplotlib chart
-            fig_mpl, ax = plt.subplots(figsize=(10, 6))
-            if len(df) <= 20:  # Only plot if reasonable number of rows
-                ax.bar(range(len(df)), pd.to_numeric(df[numerical_cols[0]], errors='coerce').fillna(0))
-                ax.set_title('Extracted Data Visualization')
-                ax.set_xlabel('Data Points')
-                ax.set_ylabel('Values')
-            else:
-                ax.text(0.5, 0.5, 'Too many data points to display', 
-                       transform=ax.transAxes, ha='center', va='center')
-                ax.set_title('Data Available (Too Large to Display)')
-            
-            data_summary = f"Extracted table with {len(df)} rows and {len(df.columns)} columns. Numerical columns: {numerical_cols}"
+            data_summary = (
+                f"Extracted table from {table_label(df)}. Numerical columns: {numerical_cols}. "
+                f"Charted column: {value_col}"
+            )
             
-            return fig_mpl, fig_plotly, data_summary
+            return chart, data_summary
     
-    # If no tables, try to create chart from regex-extracted numbers
-    numbers = extract_numbers_with_regex(extracted_data['raw_text'])
+    # If no tables, chart the percentages found in the text
+    numbers = extracted_data.get('numbers')
+    if numbers is None:
+        numbers = list(extract_numbers(extracted_data['raw_text']))
     
     if numbers:
-        # Extract just percentages for a simple chart
-        percentages = [float(re.findall(r'\d+\.?\d*', num)[0]) for num in numbers if '%' in num]
+        percentages = [record.value for record in numbers if record.kind == 'percentage']
         
         if len(percentages) >= 2:
-            # Create simple bar chart
-            fig_mpl, ax = plt.subplots(figsize=(10, 6))
-            ax.bar(range(len(percentages[:10])), percentages[:10])
-            ax.set_title('Extracted Percentages from Text')
-            ax.set_xlabel('Data Points')
-            ax.set_ylabel('Percentage (%)')
-            
-            # Plotly version
-            fig_plotly = px.bar(
-                x=list(range(len(percentages[:10]))),
-                y=percentages[:10],
-                title="Extracted Percentages from Text",
-                labels={'x': 'Data Points', 'y': 'Percentage (%)'}
+            chart = chart_spec(
+                "Extracted Percentages from Text", range(len(percentages)), percentages, y_label="Percentage (%)"
             )
             
-            data_summary = f"Extracted {len(percentages)} percentage values from text. Showing first 10."
+            data_summary = f"Extracted {len(percentages)} percentage values from text."
             
-            return fig_mpl, fig_plotly, data_summary
+            return chart, data_summary
     
-    # Default case - create a simple info chart
-    fig_mpl, ax = plt.subplots(figsize=(10, 6))
-    ax.text(0.5, 0.5, 'No suitable numerical data found for visualization\nTry uploading a PDF with tables or statistical data', 
-           transform=ax.transAxes, ha='center', va='center', fontsize=12)
-    ax.set_title('Data Extraction Result')
-    ax.axis('off')
-    
-    fig_plotly = go.Figure()
-    fig_plotly.add_annotation(
-        text="No suitable numerical data found for visualization<br>Try uploading a PDF with tables or statistical data",
-        xref="paper", yref="paper",
-        x=0.5, y=0.5, xanchor='center', yanchor='middle',
-        showarrow=False, font=dict(size=16)
+    # Default case - a simple info chart
+    chart = message_spec(
+        "Data Extraction Result",
+        "No suitable numerical data found for visualization\nTry uploading a PDF with tables or statistical data",
     )
-    fig_plotly.update_layout(title="Data Extraction Result")
     
     data_summary = "No suitable numerical data found in the document for visualization."
     
-    return fig_mpl, fig_plotly, data_summary
+    return chart, data_summary
 
-def generate_visual_insights(llm, uploaded_files):
+def generate_visual_insights(llm, parsed_documents):
     """
     Generate visual insights from PDF data
     
     Args:
         llm: Language model instance
-        uploaded_files: List of uploaded PDF files
+        parsed_documents: List of parsed documents from document_processor.parse_pdfs
         
     Returns:
         dict: Contains charts and AI analysis
     """
     try:
         # Extract data from PDF
-        extracted_data = extract_numerical_data_from_pdf(uploaded_files)
+        extracted_data = extract_numerical_data_from_pdf(parsed_documents)
         
         # Create charts
-        fig_mpl, fig_plotly, data_summary = create_sample_charts(extracted_data)
+        table_index = default_table_index(extracted_data['tables'])
+        chart, data_summary = create_sample_charts(extracted_data, table_index)
         
-        # Generate AI analysis
+        # Generate AI analysis, giving the model the parsed statistics as well
         analysis_prompt = get_chart_analysis_prompt()
         analysis_chain = LLMChain(llm=llm, prompt=analysis_prompt)
+        numbers = extracted_data['numbers']
+        number_summary = summarize_numbers(numbers)
         
         ai_analysis = analysis_chain.invoke({
-            "data_summary": data_summary,
+            "data_summary": f"{data_summary}\nStatistics found in the text:\n{number_summary}" if number_summary else data_summary,
             "chart_type": "Bar Chart/Data Visualization"
         })
         
         return {
-            'matplotlib_fig': fig_mpl,
-            'plotly_fig': fig_plotly,
+            'chart': chart,
             'data_summary': data_summary,
             'ai_analysis': ai_analysis,
-            'extracted_numbers': extract_numbers_with_regex(extracted_data['raw_text'][:2000]),  # First 2000 chars
-            'tables_found': len(extracted_data['tables'])
+            'extracted_numbers': [record.text for record in numbers if record.offset < 2000],  # First 2000 chars
+            'numbers': numbers,
+            'tables_found': len(extracted_data['tables']),
+            'table_labels': [table_label(df) for df in extracted_data['tables']],
+            'table_index': table_index
         }
         
     except Exception as e:
         # Create error chart
-        fig_mpl, ax = plt.subplots(figsize=(10, 6))
-        ax.text(0.5, 0.5, f'Error processing PDF: {str(e)}\nPlease try with a different PDF file', 
-               transform=ax.transAxes, ha='center', va='center', fontsize=12)
-        ax.set_title('Processing Error')
-        ax.axis('off')
-        
-        fig_plotly = go.Figure()
-        fig_plotly.add_annotation(
-            text=f"Error processing PDF: {str(e)}<br>Please try with a different PDF file",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, xanchor='center', yanchor='middle',
-            showarrow=False, font=dict(size=16)
+        chart = message_spec(
+            "Processing Error", f"Error processing PDF: {str(e)}\nPlease try with a different PDF file"
         )
-        fig_plotly.update_layout(title="Processing Error")
         
         return {
-            'matplotlib_fig': fig_mpl,
-            'plotly_fig': fig_plotly,
+            'chart': chart,
             'data_summary': f"Error: {str(e)}",
             'ai_analysis': "Unable to analyze due to processing error.",
             'extracted_numbers': [],
-            'tables_found': 0
+            'numbers': [],
+            'tables_found': 0,
+            'table_labels': [],
+            'table_index': None
         }
\ No newline at end of file